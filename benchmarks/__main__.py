@@ -0,0 +1,221 @@
+import argparse
+import json
+import logging
+import platform
+import statistics
+import threading
+import time
+import timeit
+from pathlib import Path
+
+import vban_cmd
+from vban_cmd.emulator import Emulator
+from vban_cmd.kinds import KindId
+from vban_cmd.levels import request_level_backend
+from vban_cmd.packet import VbanRtPacket
+from vban_cmd.subject import Subject
+from vban_cmd.util import comp, script
+
+try:
+    import tomllib
+except ModuleNotFoundError:
+    import tomli as tomllib
+
+logging.basicConfig(level=logging.WARNING)
+
+KINDS = tuple(kind_id.name.lower() for kind_id in KindId)
+
+
+def measure(fn, repeat: int = 5) -> dict:
+    """times fn with timeit, returns the best and median time per call (us) of repeat runs"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = [t / number * 1e6 for t in timer.repeat(repeat, number)]
+    return {
+        "best_us": round(min(times), 3),
+        "median_us": round(statistics.median(times), 3),
+        "ops_per_sec": round(1e6 / min(times)),
+    }
+
+
+def packets(vban, num: int = 2) -> list:
+    """returns copies of the next num RT packets received by a remote"""
+    data = []
+    while len(data) < num:
+        if not data or vban.public_packet._data.tobytes() != data[-1]:
+            data.append(vban.public_packet._data.tobytes())
+        time.sleep(0.005)
+    return data
+
+
+def bench_decode(kind, data: bytes, backend: str):
+    levels = request_level_backend(backend)
+
+    def decode():
+        packet = VbanRtPacket(kind, memoryview(data), levels)
+        packet.inputlevels_db
+        packet.outputlevels_db
+        packet.stripstate
+        packet.busstate
+        packet.stripgainlayers
+        packet.busgain
+        packet.striplabels
+        packet.buslabels
+
+    return measure(decode)
+
+
+def bench_dirty(kind, data0: bytes, data1: bytes) -> dict:
+    levels = request_level_backend("array")
+    p0 = VbanRtPacket(kind, memoryview(data0), levels)
+    p1 = VbanRtPacket(kind, memoryview(data1), levels)
+    strip_cache, bus_cache = p0.inputlevels, p0.outputlevels
+    strip_levels = tuple(p1.inputlevels)
+    return {
+        "pdirty": measure(lambda: p1.pdirty(p0)),
+        "pdiff": measure(lambda: p1.pdiff(p0)),
+        "ldirty": measure(lambda: p1.ldirty(strip_cache, bus_cache)),
+        "util.comp": measure(lambda: tuple(comp(tuple(strip_cache), strip_levels))),
+    }
+
+
+def bench_notify(observers: int = 10) -> dict:
+    subject = Subject()
+
+    def on_pdirty():
+        pass
+
+    class Observer:
+        def on_update(self, event):
+            pass
+
+    subject.add([on_pdirty] + [Observer() for _ in range(observers - 1)])
+    return measure(lambda: subject.notify("pdirty"))
+
+
+def bench_script(kind) -> dict:
+    encode = script(lambda remote, script: script)
+    params = {
+        f"strip-{i}": {"mute": True, "gain": -6.0, "A1": False, "label": f"strip{i}"}
+        for i in range(kind.num_strip)
+    } | {f"bus-{i}": {"mute": False, "gain": 0.0} for i in range(kind.num_bus)}
+    return measure(lambda: encode(None, params))
+
+
+def bench_set_and_observe(kind_id: str, opts: dict, samples: int, **kwargs) -> dict:
+    """times setter to observed pdirty with the new value in the public packet (ms)"""
+    observed = threading.Event()
+
+    def on_pdirty():
+        observed.set()
+
+    latencies = []
+    with vban_cmd.api(kind_id, pdirty=True, sync=False, **opts, **kwargs) as vban:
+        vban.subject.add(on_pdirty)
+        for i in range(samples):
+            mute = not vban.public_packet.stripstate[0] & 1
+            observed.clear()
+            start = time.perf_counter()
+            vban.strip[0].mute = mute
+            while bool(vban.public_packet.stripstate[0] & 1) != mute:
+                if not observed.wait(1):
+                    raise TimeoutError(f"no pdirty after setting strip[0].mute={mute}")
+                observed.clear()
+            latencies.append((time.perf_counter() - start) * 1e3)
+    # inclusive, so small samples are not extrapolated past the slowest latency
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "samples": samples,
+        "p50_ms": round(quantiles[49], 3),
+        "p90_ms": round(quantiles[89], 3),
+        "p99_ms": round(quantiles[98], 3),
+        "max_ms": round(max(latencies), 3),
+    }
+
+
+def run(kind_id: str, args) -> dict:
+    opts = {"port": args.port, "streamname": "benchmark"}
+    with Emulator(
+        kind_id, port=args.port, streamname="benchmark", rate=args.rate
+    ) as emulator:
+        opts["ip"] = emulator.host
+        results = {}
+        with vban_cmd.api(kind_id, ldirty=True, latest=True, **opts) as vban:
+            kind = vban.kind
+            data0, data1 = packets(vban)
+            results["decode"] = bench_decode(kind, data1, "array")
+            try:
+                results["decode (numpy)"] = bench_decode(kind, data1, "numpy")
+            except vban_cmd.error.VBANCMDError:
+                pass
+            results |= bench_dirty(kind, data0, data1)
+            results["Subject.notify (10 observers)"] = bench_notify()
+            results["StripLevel.getter"] = measure(
+                lambda: vban.strip[0].levels.prefader
+            )
+            results["util.script"] = bench_script(kind)
+            results["_set_rt"] = measure(lambda: vban._set_rt("strip[0].gain", -6.0))
+        results["set -> observe (threads)"] = bench_set_and_observe(
+            kind_id, opts, args.samples, latest=True
+        )
+        results["set -> observe (selector)"] = bench_set_and_observe(
+            kind_id, opts, args.samples, engine="selector"
+        )
+    return results
+
+
+def report(kind_id: str, results: dict):
+    print(f"\n{kind_id}")
+    for name, result in results.items():
+        print(f"  {name:<32}" + "  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+def version() -> str:
+    pyproject = Path(__file__).parent.parent / "pyproject.toml"
+    try:
+        with open(pyproject, "rb") as f:
+            return tomllib.load(f)["tool"]["poetry"]["version"]
+    except (OSError, KeyError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the RT ingest and command pipelines against a local emulator"
+    )
+    parser.add_argument(
+        "--kind",
+        action="append",
+        choices=KINDS,
+        dest="kinds",
+        help="may be repeated, all kinds by default",
+    )
+    parser.add_argument("--port", type=int, default=6990)
+    parser.add_argument(
+        "--rate", type=float, default=1000, help="RT packets per second"
+    )
+    parser.add_argument(
+        "--samples", type=int, default=200, help="set -> observe samples"
+    )
+    parser.add_argument("--output", type=Path, help="JSON results file")
+    args = parser.parse_args()
+
+    results = {
+        "version": version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rate": args.rate,
+        "kinds": {},
+    }
+    for kind_id in args.kinds or KINDS:
+        results["kinds"][kind_id] = run(kind_id, args)
+        report(kind_id, results["kinds"][kind_id])
+
+    output = args.output or Path.cwd() / f"benchmark-{results['version']}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
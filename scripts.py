@@ -19,6 +19,11 @@ def ex_observer():
     subprocess.run([sys.executable, str(scriptpath)])
 
 
+def benchmark():
+    scriptpath = Path.cwd() / "benchmarks" / "."
+    subprocess.run([sys.executable, str(scriptpath), *sys.argv[1:]])
+
+
 def test_basic():
     os.environ["KIND"] = "basic"
     subprocess.run(["tox"])
@@ -1,11 +1,12 @@
 import os
 import random
-import sys
 from dataclasses import dataclass
 
 import vban_cmd
+from vban_cmd.emulator import Emulator, Model
 from vban_cmd.kinds import KindId
 from vban_cmd.kinds import request_kind_map as kindmap
+from vban_cmd.packet import HEADER_SIZE, RT_PACKET_SIZE, VbanRtPacketHeader
 
 # get KIND_ID from env var, otherwise set to random
 KIND_ID = os.environ.get(
@@ -19,6 +20,15 @@ opts = {
     "bps": 0,
 }
 
+# set EMULATOR=1 to test against a local emulator rather than a live Voicemeeter
+# EMULATOR=0 (or unset) tests against the Voicemeeter at opts["ip"]
+EMULATOR = os.environ.get("EMULATOR", "").strip().lower() in ("1", "true", "yes", "on")
+
+if EMULATOR:
+    emulator = Emulator(KIND_ID, port=opts["port"], streamname=opts["streamname"])
+    emulator.start()
+    opts["ip"] = emulator.host
+
 vban = vban_cmd.api(KIND_ID, **opts)
 kind = kindmap(KIND_ID)
 
@@ -41,11 +51,12 @@ class Data:
 data = Data()
 
 
-def setup_module():
-    print(f"\nRunning tests for kind [{data.name}]\n", file=sys.stdout)
-    vban.login()
-    vban.command.reset()
-
-
-def teardown_module():
-    vban.logout()
+def rt_packet(commands: dict = None) -> bytes:
+    """returns an RT packet of the kind under test, with the parameters set by request commands"""
+    model = Model(kind)
+    for cmd, val in (commands or {}).items():
+        model.apply(cmd, str(val))
+    packet = bytearray(RT_PACKET_SIZE)
+    packet[:HEADER_SIZE] = VbanRtPacketHeader().header
+    model.pack_into(packet)
+    return bytes(packet)
@@ -1,3 +1,11 @@
+import sys
+
+import pytest
+
+from tests import KIND_ID, data, vban
+from vban_cmd.emulator import Emulator
+
+
 def pytest_addoption(parser):
     parser.addoption(
         "--run-slow",
@@ -5,3 +13,20 @@ def pytest_addoption(parser):
         default=False,
         help="Run slow tests",
     )
+
+
+@pytest.fixture(scope="session")
+def login():
+    """logs in the shared remote, for the tests that need Voicemeeter (or the emulator)"""
+    print(f"\nRunning tests for kind [{data.name}]\n", file=sys.stdout)
+    vban.login()
+    vban.command.reset()
+    yield vban
+    vban.logout()
+
+
+@pytest.fixture
+def emulator():
+    """a private emulator, for tests that don't use the shared remote"""
+    with Emulator(KIND_ID, port=6991, streamname="private") as emulator:
+        yield emulator
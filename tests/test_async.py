@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+import vban_cmd
+from tests import KIND_ID
+from vban_cmd.error import VBANCMDConnectionError
+from vban_cmd.iremote import Modes
+
+
+def remote(emulator, **kwargs):
+    return vban_cmd.async_api(
+        KIND_ID,
+        ip=emulator.host,
+        port=emulator.port,
+        streamname=emulator.streamname,
+        **kwargs,
+    )
+
+
+async def until(predicate, timeout: float = 1):
+    """polls predicate on the loop until it is true"""
+
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+class TestAsyncVbanCmd:
+    __test__ = True
+
+    """Tests the asyncio client against the emulator"""
+
+    def test_it_logs_in_and_out(self, emulator):
+        async def main():
+            async with remote(emulator) as vban:
+                assert not vban.stopped()
+                assert vban.public_packet is not None
+                assert vban.handler.received >= 1
+            return vban
+
+        assert asyncio.run(main()).stopped()
+
+    def test_it_times_out_without_rt_packets(self, emulator):
+        async def main():
+            # nothing streams to this port
+            vban = remote(emulator, timeout=0.3)
+            vban.port = emulator.port + 10
+            await vban.alogin()
+
+        with pytest.raises(
+            VBANCMDConnectionError, match="timeout waiting for RtPacket"
+        ):
+            asyncio.run(main())
+
+    def test_it_sets_and_drains(self, emulator):
+        async def main():
+            async with remote(emulator, combine=True) as vban:
+                await vban.set("strip[0].mute", 1)
+                await vban.set("bus[0].gain", -3.0)
+                # buffered, until drained
+                assert vban.datagrams_sent == 0
+                await vban.drain()
+                assert vban.datagrams_sent == 1
+                await until(lambda: emulator.model.stripstate[0] & Modes._mute)
+                assert emulator.model.busgain[0] == -3.0
+
+        asyncio.run(main())
+
+    def test_it_iterates_events(self, emulator):
+        async def main():
+            async with remote(emulator, pdirty=True) as vban:
+                await vban.set("strip[1].mute", 1)
+                events = vban.events()
+
+                async def changed():
+                    async for event in events:
+                        if event == "pdirty" and vban.pdiff.strip(1):
+                            return
+
+                await asyncio.wait_for(changed(), 1)
+                await events.aclose()
+                assert vban.strip[1].mute
+
+        asyncio.run(main())
+
+    def test_it_completes_coalesced_paced_futures(self, emulator):
+        async def main():
+            async with remote(emulator, pps=50) as vban:
+                futs = [vban._set_rt("strip[0].gain", -i) for i in range(5)]
+                # replaced before it was sent, every setter waits on the first packet
+                assert all(fut is futs[0] for fut in futs)
+                await asyncio.wait_for(futs[0], 1)
+                await vban.drain()
+                assert vban.datagrams_sent == 1
+                assert vban.stats["pace"]["coalesced"] == 4
+                await until(lambda: emulator.model.gainlayers[0][0] == -4.0)
+
+        asyncio.run(main())
+
+    def test_it_completes_the_future_of_a_stale_paced_command(self, emulator):
+        async def main():
+            async with remote(emulator, pps=1, deadlines={"mute": 0}) as vban:
+                # the first packet takes the burst, the second waits for a token
+                await vban._set_rt("strip[0].gain", -1.0)
+                fut = vban._set_rt("strip[0].mute", 1)
+                await asyncio.wait_for(fut, 2)
+                await vban.drain()
+                assert vban.stats["pace"]["dropped"] == 1
+                assert vban.datagrams_sent == 1
+
+        asyncio.run(main())
@@ -0,0 +1,181 @@
+import time
+
+import pytest
+
+from vban_cmd.buffer import CommandBuffer, Flusher, SendQueue
+from vban_cmd.packet import MAX_PACKET_SIZE
+
+
+class Timer:
+    """stands in for the flush timer, the test fires it"""
+
+    def __init__(self, interval, callback):
+        self.interval = interval
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fire(self):
+        self.callback()
+
+
+@pytest.fixture
+def timers():
+    return []
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def buffer(sent, timers):
+    def schedule(interval, callback):
+        timers.append(Timer(interval, callback))
+        return timers[-1]
+
+    return CommandBuffer(sent.append, 0.01, schedule=schedule)
+
+
+class TestCommandBuffer:
+    __test__ = True
+
+    """Tests write-combining of request commands"""
+
+    def test_it_coalesces_a_keyed_fragment(self, buffer, sent):
+        buffer.add(b"strip[0].gain=1;", "strip[0].gain")
+        buffer.add(b"strip[1].mute=1;", "strip[1].mute")
+        buffer.add(b"strip[0].gain=2;", "strip[0].gain")
+        buffer.flush()
+        assert sent == [b"strip[1].mute=1;strip[0].gain=2;"]
+        assert buffer.coalesced == 1
+
+    def test_it_never_coalesces_fragments_without_a_key(self, buffer, sent):
+        buffer.add(b"strip[0].fadeby=(1, 100);")
+        buffer.add(b"strip[0].fadeby=(1, 100);")
+        buffer.flush()
+        assert sent == [b"strip[0].fadeby=(1, 100);" * 2]
+        assert buffer.coalesced == 0
+
+    def test_it_arms_one_timer_per_datagram(self, buffer, sent, timers):
+        buffer.add(b"a=1;", "a")
+        buffer.add(b"b=1;", "b")
+        assert [timer.interval for timer in timers] == [0.01]
+        timers[0].fire()
+        assert sent == [b"a=1;b=1;"] and len(buffer) == 0
+        buffer.add(b"a=2;", "a")
+        assert len(timers) == 2
+
+    def test_it_cancels_the_timer_on_flush(self, buffer, sent, timers):
+        buffer.add(b"a=1;", "a")
+        buffer.flush()
+        assert timers[0].cancelled
+        buffer.flush()
+        assert sent == [b"a=1;"]
+
+    def test_it_flushes_before_a_fragment_would_overflow(self, buffer, sent):
+        fragment = b"x" * (MAX_PACKET_SIZE // 3) + b";"
+        for key in range(3):
+            buffer.add(fragment, key)
+        assert sent == [fragment * 2]
+        assert len(buffer) == 1
+
+    def test_it_drops_stale_fragments(self, sent):
+        dropped = []
+        buffer = CommandBuffer(
+            sent.append,
+            0,
+            deadlines={"gain": 10, "strip[1].gain": 0},
+            on_drop=dropped.append,
+        )
+        buffer.add(b"strip[0].gain=1;", "strip[0].gain")
+        buffer.add(b"strip[1].gain=1;", "strip[1].gain")
+        buffer.add(b"strip[1].mute=1;", "strip[1].mute")
+        time.sleep(0.01)
+        buffer.flush()
+        assert sent == [b"strip[0].gain=1;strip[1].mute=1;"]
+        assert dropped == ["strip[1].gain"] and buffer.dropped == 1
+
+
+class TestFlusher:
+    __test__ = True
+
+    """Tests the thread that runs the flush timer of a buffer"""
+
+    def test_it_flushes_every_batch_on_one_thread(self, sent):
+        buffer = CommandBuffer(sent.append, 0.01)
+        try:
+            for i in range(3):
+                buffer.add(f"a={i};".encode(), "a")
+                thread = buffer.schedule._thread
+                time.sleep(0.05)
+                assert sent[i:] == [f"a={i};".encode()]
+                assert buffer.schedule._thread is thread
+        finally:
+            buffer.close()
+        assert not thread.is_alive()
+
+    def test_a_cancelled_timer_does_not_fire(self):
+        fired = []
+        flusher = Flusher()
+        try:
+            flusher(0.01, lambda: fired.append(None)).cancel()
+            time.sleep(0.05)
+            assert not fired
+            flusher(0.01, lambda: fired.append(None))
+            time.sleep(0.05)
+            assert fired == [None]
+        finally:
+            flusher.close()
+
+    def test_it_starts_again_after_close(self, sent):
+        buffer = CommandBuffer(sent.append, 0.01)
+        buffer.add(b"a=1;", "a")
+        buffer.close()
+        assert sent == [b"a=1;"] and buffer.schedule._thread is None
+        try:
+            buffer.add(b"a=2;", "a")
+            time.sleep(0.05)
+            assert sent == [b"a=1;", b"a=2;"]
+        finally:
+            buffer.close()
+
+
+class TestSendQueue:
+    __test__ = True
+
+    """Tests the queue of request packets waiting for the send scheduler"""
+
+    def test_it_coalesces_in_place(self):
+        queue = SendQueue()
+        assert queue.put(b"a=1;", "a", "w1") == "w1"
+        queue.put(b"b=1;", "b", "w2")
+        # the replacing packet takes the place and the waiter of the packet it replaces
+        assert queue.put(b"a=2;", "a", "w3") == "w1"
+        assert queue.peek() == b"a=2;"
+        assert [queue.pop(), queue.pop(), queue.pop()] == [
+            (b"a=2;", "w1"),
+            (b"b=1;", "w2"),
+            None,
+        ]
+        assert queue.coalesced == 1
+
+    def test_it_never_coalesces_packets_without_a_key(self):
+        queue = SendQueue()
+        queue.put(b"a=1;")
+        queue.put(b"a=1;")
+        assert len(queue) == 2 and queue.coalesced == 0
+
+    def test_it_drops_stale_packets(self):
+        dropped = []
+        queue = SendQueue(
+            {"gain": 0}, on_drop=lambda key, waiter: dropped.append((key, waiter))
+        )
+        queue.put(b"strip[0].gain=1;", "strip[0].gain", "w1")
+        queue.put(b"strip[0].mute=1;", "strip[0].mute", "w2")
+        time.sleep(0.01)
+        assert queue.pop() == (b"strip[0].mute=1;", "w2")
+        assert dropped == [("strip[0].gain", "w1")] and queue.dropped == 1
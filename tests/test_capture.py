@@ -0,0 +1,72 @@
+import pytest
+
+import vban_cmd
+from tests import KIND_ID, rt_packet
+from vban_cmd.capture import HEADER, RECORD_SIZE, CaptureReader, CaptureWriter
+from vban_cmd.error import VBANCMDError
+from vban_cmd.packet import ParamDiff
+
+
+@pytest.fixture
+def packets():
+    return [
+        rt_packet(),
+        rt_packet({"strip[1].mute": 1}),
+        rt_packet({"strip[1].mute": 1}),
+        rt_packet({"strip[1].mute": 1, "bus[1].gain": -3}),
+    ]
+
+
+def capture(filepath, packets):
+    # one record per chunk, so the file grows on every write
+    writer = CaptureWriter(filepath, chunk=RECORD_SIZE)
+    for i, data in enumerate(packets):
+        writer.write(data, stamp=i / 100)
+    return writer
+
+
+class TestCapture:
+    __test__ = True
+
+    """Tests writing, reading and replaying RT packet captures"""
+
+    def test_it_reads_back_what_was_written(self, tmp_path, packets):
+        filepath = tmp_path / "rt.vbrt"
+        capture(filepath, packets).close()
+        assert filepath.stat().st_size == HEADER.size + len(packets) * RECORD_SIZE
+        with CaptureReader(filepath) as reader:
+            assert len(reader) == len(packets)
+            records = [(stamp, view.tobytes()) for stamp, view in reader]
+        assert records == [(i / 100, data) for i, data in enumerate(packets)]
+
+    def test_it_reads_a_capture_cut_short(self, tmp_path, packets):
+        filepath = tmp_path / "rt.vbrt"
+        writer = capture(filepath, packets[:2])
+        try:
+            with CaptureReader(filepath) as reader:
+                assert [view.tobytes() for _, view in reader] == packets[:2]
+        finally:
+            writer.close()
+
+    @pytest.mark.parametrize("contents", [b"VBRT", b"x" * 100])
+    def test_it_rejects_a_file_that_is_not_a_capture(self, tmp_path, contents):
+        filepath = tmp_path / "rt.vbrt"
+        filepath.write_bytes(contents)
+        with pytest.raises(VBANCMDError, match="is not an RT packet capture"):
+            CaptureReader(filepath)
+
+    def test_it_replays_a_capture(self, tmp_path, packets):
+        filepath = tmp_path / "rt.vbrt"
+        capture(filepath, packets).close()
+        diffs = []
+
+        def on_pdirty(pdiff):
+            diffs.append(pdiff)
+
+        remote = vban_cmd.api(KIND_ID, ip="127.0.0.2", pdirty=True)
+        remote.subject.add(on_pdirty)
+        assert remote.replay(filepath, speed=0) == len(packets)
+        assert diffs == [ParamDiff(stripstate=0b10), ParamDiff(busgain=0b10)]
+        assert remote.strip[1].mute and remote.bus[1].gain == -3
+        assert remote.handler.skipped == 1
+        assert remote.handler.received == len(packets)
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from vban_cmd.channel import EventChannel
+from vban_cmd.packet import ParamDiff
+
+
+class TestEventChannel:
+    __test__ = True
+
+    """Tests the overflow policies of the channel between the producer and updater threads"""
+
+    def test_it_coalesces_a_pending_event(self):
+        channel = EventChannel("coalesce")
+        channel.put("pdirty", "p0", ParamDiff(stripstate=0b01))
+        channel.put("pdirty", "p1", ParamDiff(busgain=0b10))
+        assert len(channel) == 1 and channel.coalesced == 1
+        assert channel.get() == (
+            "pdirty",
+            "p1",
+            ParamDiff(stripstate=0b01, busgain=0b10),
+        )
+
+    def test_it_drops_a_newer_event(self):
+        channel = EventChannel("drop")
+        channel.put("pdirty", "p0")
+        channel.put("pdirty", "p1")
+        assert channel.dropped == 1
+        assert channel.get() == ("pdirty", "p0", None)
+
+    def test_it_blocks_the_producer(self):
+        channel = EventChannel("block")
+        channel.put("ldirty", "p0")
+        producer = threading.Thread(target=channel.put, args=("ldirty", "p1"))
+        producer.start()
+        producer.join(0.05)
+        assert producer.is_alive()
+        assert channel.get() == ("ldirty", "p0", None)
+        producer.join(1)
+        assert not producer.is_alive()
+        assert channel.get() == ("ldirty", "p1", None)
+
+    def test_it_holds_one_event_of_each_kind(self):
+        channel = EventChannel()
+        channel.put("pdirty", "p0")
+        channel.put("ldirty", "p1")
+        assert len(channel) == 2
+        assert [channel.get()[0], channel.get()[0]] == ["pdirty", "ldirty"]
+
+    def test_it_waits_for_dispatch_to_go_idle(self):
+        channel = EventChannel()
+        channel.put("pdirty", "p0")
+        assert not channel.wait_idle(0.01)
+        channel.get()
+        assert not channel.wait_idle(0.01)
+        channel.done()
+        assert channel.wait_idle(0)
+
+    def test_it_returns_pending_events_once_closed(self):
+        channel = EventChannel()
+        channel.put("pdirty", "p0")
+        channel.close()
+        assert channel.get() == ("pdirty", "p0", None)
+        assert channel.get() is None
+
+    def test_it_rejects_an_unknown_policy(self):
+        with pytest.raises(ValueError, match="Unknown overflow policy 'spill'"):
+            EventChannel("spill")
@@ -4,6 +4,8 @@ import pytest
 
 from tests import data, vban
 
+pytestmark = pytest.mark.usefixtures("login")
+
 
 class TestSetAndGetBoolHigher:
     __test__ = True
@@ -0,0 +1,47 @@
+import socket
+import sys
+
+import pytest
+
+import vban_cmd
+from tests import KIND_ID
+from vban_cmd.emulator import Emulator
+
+
+class TestReplyAddress:
+    __test__ = True
+
+    """Tests the address the emulator sends RT packets to"""
+
+    def test_it_replies_to_the_source_of_a_remote_registration(self, emulator):
+        assert emulator._reply_to("192.0.2.7") == "192.0.2.7"
+
+    def test_it_replies_to_reply_host(self):
+        with Emulator(KIND_ID, port=6992, reply_host="192.0.2.8") as emulator:
+            assert emulator._reply_to("127.0.0.1") == "192.0.2.8"
+            assert emulator._reply_to("192.0.2.7") == "192.0.2.8"
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="binds 127.0.1.1")
+    def test_it_streams_to_a_client_bound_to_its_host_address(
+        self, emulator, monkeypatch
+    ):
+        # as on hosts that map their hostname to 127.0.1.1, a registration still comes from 127.0.0.1
+        # the selector engine fails the login on a timeout, rather than leave a subscriber thread running
+        gethostbyname = socket.gethostbyname
+        monkeypatch.setattr(
+            socket,
+            "gethostbyname",
+            lambda host: (
+                "127.0.1.1" if host == socket.gethostname() else gethostbyname(host)
+            ),
+        )
+        with vban_cmd.api(
+            KIND_ID,
+            ip=emulator.host,
+            port=emulator.port,
+            streamname=emulator.streamname,
+            engine="selector",
+            timeout=1,
+        ) as remote:
+            assert "127.0.1.1" in emulator.subscribers
+            assert remote.public_packet is not None
@@ -0,0 +1,232 @@
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import vban_cmd
+from tests import KIND_ID, rt_packet
+from vban_cmd.capture import CaptureWriter
+from vban_cmd.channel import EventChannel
+from vban_cmd.emulator import Emulator
+from vban_cmd.worker import Engine, PacketHandler, Updater
+
+
+class TestInlineDispatch:
+    __test__ = True
+
+    """Tests sync getters called by observers on the thread that handles RT packets"""
+
+    def test_it_reads_a_getter_on_the_selector_engine(self, emulator):
+        observed = threading.Event()
+        remote = vban_cmd.api(
+            KIND_ID,
+            ip=emulator.host,
+            port=emulator.port,
+            streamname=emulator.streamname,
+            engine="selector",
+            pdirty=True,
+            sync=True,
+        )
+
+        def on_pdirty():
+            # not cached by the setter, so the getter would wait for pdirty to clear
+            remote.bus[0].mono
+            observed.set()
+
+        remote.subject.add(on_pdirty)
+        remote.login()
+        try:
+            remote.strip[0].mute = True
+            assert observed.wait(2), "the observer never returned"
+        finally:
+            # releases an observer stuck in clear_dirty, a regression fails rather than hangs
+            remote._pdirty = False
+            remote.logout()
+
+    def test_it_reads_a_getter_on_replay(self, tmp_path):
+        filepath = tmp_path / "rt.vbrt"
+        writer = CaptureWriter(filepath)
+        for data in (rt_packet(), rt_packet({"strip[0].mute": 1})):
+            writer.write(data)
+        writer.close()
+        remote = vban_cmd.api(KIND_ID, ip="127.0.0.2", pdirty=True, sync=True)
+        mono = []
+
+        def on_pdirty():
+            mono.append(remote.bus[0].mono)
+
+        remote.subject.add(on_pdirty)
+        replay = threading.Thread(target=remote.replay, args=(filepath, 0), daemon=True)
+        replay.start()
+        replay.join(2)
+        alive = replay.is_alive()
+        remote._pdirty = False
+        assert not alive and mono == [False]
+
+
+class TestSelectorEngine:
+    __test__ = True
+
+    """Tests the selector engine under a backlog of RT packets"""
+
+    def test_it_renews_and_stops_behind_slow_observers(self, monkeypatch):
+        monkeypatch.setattr(Engine, "RENEW", 0.1)
+        with Emulator(KIND_ID, port=6993, streamname="slow", rate=1000) as emulator:
+            remote = vban_cmd.api(
+                KIND_ID,
+                ip=emulator.host,
+                port=emulator.port,
+                streamname=emulator.streamname,
+                engine="selector",
+                ldirty=True,
+            )
+
+            def on_ldirty():
+                # slower than the packets arrive
+                time.sleep(0.003)
+
+            remote.subject.add(on_ldirty)
+            remote.login()
+            time.sleep(0.5)
+            start = time.monotonic()
+            remote.logout()
+            assert time.monotonic() - start < 1
+            assert remote.producer.packet.framecounter > 2
+
+
+class TestLatest:
+    __test__ = True
+
+    """Tests draining the socket buffer to the newest RT packet"""
+
+    @pytest.mark.parametrize("latest", [False, True])
+    def test_it_handles_only_the_newest_packet(self, emulator, latest):
+        # packets arrive about 5 times faster than the producer handles them
+        with vban_cmd.api(
+            KIND_ID,
+            ip=emulator.host,
+            port=emulator.port,
+            streamname=emulator.streamname,
+            latest=latest,
+            ratelimit=0.1,
+        ) as remote:
+            time.sleep(0.5)
+        handler = remote.handler
+        if latest:
+            assert handler.superseded >= 5
+            assert handler.received >= handler.superseded + handler.accepted
+        else:
+            assert handler.superseded == 0
+
+
+class TestPipelines:
+    __test__ = True
+
+    """Tests the separate parameter and level pipelines"""
+
+    def test_level_dispatch_yields_to_pending_parameter_events(self):
+        dispatched = []
+        handler = SimpleNamespace(dispatch=lambda event, *_: dispatched.append(event))
+        remote = SimpleNamespace(handler=handler, ratelimit=1)
+        params, levels = EventChannel(), EventChannel()
+        updater = Updater(remote, levels, name="level updater", yield_to=params)
+        params.put("pdirty", None)
+        levels.put("ldirty", None)
+        updater.start()
+        try:
+            time.sleep(0.1)
+            assert dispatched == []
+            params.get()
+            params.done()
+            levels.wait_idle(1)
+            assert dispatched == ["ldirty"]
+        finally:
+            levels.close()
+            updater.join(1)
+
+    def test_a_slow_level_observer_does_not_delay_parameter_events(self, emulator):
+        remote = vban_cmd.api(
+            KIND_ID,
+            ip=emulator.host,
+            port=emulator.port,
+            streamname=emulator.streamname,
+            pdirty=True,
+            ldirty=True,
+        )
+        observed = threading.Event()
+
+        def on_pdirty():
+            observed.set()
+
+        def on_ldirty():
+            time.sleep(0.5)
+
+        remote.subject.add([on_pdirty, on_ldirty])
+        with remote:
+            # the level updater is now stuck in on_ldirty
+            time.sleep(0.1)
+            observed.clear()
+            start = time.monotonic()
+            remote.strip[0].mute = True
+            assert observed.wait(1)
+            assert time.monotonic() - start < 0.3
+
+
+class TestPacketHandler:
+    __test__ = True
+
+    """Tests the packet counters of a packet handler"""
+
+    @pytest.mark.parametrize("recv_buffers", [0, 4])
+    def test_it_counts_every_rt_packet_received(self, recv_buffers):
+        # drained packets never reach handle(), they still count as received
+        remote = vban_cmd.api(KIND_ID, ip="127.0.0.2", recv_buffers=recv_buffers)
+        handler = PacketHandler(remote)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as rx, socket.socket(
+            socket.AF_INET, socket.SOCK_DGRAM
+        ) as tx:
+            rx.bind(("127.0.0.1", 0))
+            rx.settimeout(1)
+            for data in (rt_packet(), b"VBAN", rt_packet({"strip[0].mute": 1})):
+                tx.sendto(data, rx.getsockname())
+            received = [handler.recv(rx) for _ in range(3)]
+        assert [data is not None for data in received] == [True, False, True]
+        assert handler.received == 2 and handler.malformed == 1
+
+    def test_it_skips_a_packet_identical_to_the_last_accepted(self):
+        remote = vban_cmd.api(KIND_ID, ip="127.0.0.2", pdirty=True)
+        handler = PacketHandler(remote)
+        handler.prime(rt_packet())
+        public = remote.public_packet
+        assert handler.handle(rt_packet()) == ()
+        assert handler.skipped == 1 and handler.packet is None
+        assert remote.public_packet is public
+        assert handler.handle(rt_packet({"strip[0].mute": 1})) == ("pdirty",)
+        assert handler.skipped == 1 and handler.accepted == 2
+        # compared with the packet accepted last
+        assert handler.handle(rt_packet({"strip[0].mute": 1})) == ()
+        assert handler.skipped == 2
+
+    def test_it_reuses_pooled_buffers(self):
+        remote = vban_cmd.api(KIND_ID, ip="127.0.0.2", recv_buffers=2)
+        handler = PacketHandler(remote)
+        # changed, malformed and unchanged packets, each buffer is returned to the pool
+        packets = [rt_packet({"strip[0].gain": -(i // 2)}) for i in range(10)]
+        packets.insert(5, b"VBAN" + bytes(2000))
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as rx, socket.socket(
+            socket.AF_INET, socket.SOCK_DGRAM
+        ) as tx:
+            rx.bind(("127.0.0.1", 0))
+            rx.settimeout(1)
+            for data in packets:
+                tx.sendto(data, rx.getsockname())
+            handler.prime(handler.recv(rx))
+            for _ in packets[1:]:
+                if (data := handler.recv(rx)) is not None:
+                    handler.handle(data)
+        assert handler.malformed == 1 and handler.skipped == 5
+        # the public packet holds one buffer, the other is free
+        assert handler.pool.allocated == 2 and len(handler.pool) == 1
+        assert remote.strip[0].gain == -4.0
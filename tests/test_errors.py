@@ -5,6 +5,8 @@ import pytest
 import vban_cmd
 from tests import data, vban
 
+pytestmark = pytest.mark.usefixtures("login")
+
 
 class TestErrors:
     __test__ = True
@@ -2,6 +2,8 @@ import pytest
 
 from tests import data, vban
 
+pytestmark = pytest.mark.usefixtures("login")
+
 
 @pytest.mark.parametrize("value", [False, True])
 class TestSetAndGetBoolHigher:
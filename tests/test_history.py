@@ -0,0 +1,66 @@
+from array import array
+
+import pytest
+
+from tests import kind
+from vban_cmd.history import LevelHistory
+from vban_cmd.levels import request_level_backend
+
+
+@pytest.fixture(params=["array", "numpy"])
+def levels(request):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    return request_level_backend(request.param)
+
+
+def history(levels, frames: int, capacity: int = 4) -> LevelHistory:
+    """returns a history holding frames stamped 1, 2, ... with every level word of a frame set to its stamp"""
+    history = LevelHistory(kind, capacity, levels)
+    for i in range(1, frames + 1):
+        history.append(
+            array("H", [i] * kind.num_strip_levels),
+            array("H", [i] * kind.num_bus_levels),
+            now=float(i),
+        )
+    return history
+
+
+class TestLevelHistory:
+    __test__ = True
+
+    """Tests the mirrored ring buffer of level frames"""
+
+    def test_it_is_empty(self, levels):
+        assert history(levels, 0)._rows(0) == (8, 8)
+        stamps, frames = history(levels, 0).levels_since(0)
+        assert len(stamps) == 0 and len(frames) == 0
+
+    def test_it_reads_the_mirror_before_wrapping(self, levels):
+        h = history(levels, 2)
+        assert len(h) == 2
+        assert h._rows(0) == (4, 6)
+        assert h._rows(1.5) == (5, 6)
+
+    @pytest.mark.parametrize("frames", [4, 5, 6, 7, 8, 9])
+    def test_it_keeps_the_latest_frames_contiguous(self, levels, frames):
+        h = history(levels, frames)
+        start, stop = h._rows(0)
+        assert stop - start == 4
+        # the newest frame is the mirror row of its slot
+        assert stop == (frames - 1) % 4 + 5
+        stamps, rows = h.levels_since(0)
+        assert list(stamps) == [float(i) for i in range(frames - 3, frames + 1)]
+        assert [row[0] for row in rows.tolist()] == list(range(frames - 3, frames + 1))
+
+    def test_it_returns_the_frames_after_t(self, levels):
+        h = history(levels, 6)
+        stamps, _ = h.levels_since(4.5)
+        assert list(stamps) == [5.0, 6.0]
+        assert h._rows(6) == (6, 6)
+
+    def test_it_returns_a_channel_window(self, levels):
+        h = history(levels, 6)
+        channel = h.buses.start
+        _, values = h.window(channel, 1e9)
+        assert list(values) == [3, 4, 5, 6]
@@ -0,0 +1,48 @@
+import struct
+
+import pytest
+
+from vban_cmd.levels import request_level_backend
+from vban_cmd.util import comp
+
+WORDS = tuple(range(1 << 16))
+
+
+def fget(i):
+    """the per-channel conversion the level backends replace"""
+    return round((((1 << 16) - 1) - i) * -0.01, 1)
+
+
+@pytest.fixture(params=["array", "numpy"])
+def levels(request):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    return request_level_backend(request.param)
+
+
+def decode(levels, words, buf=bytes):
+    data = buf(struct.pack(f"<{len(words)}H", *words))
+    return levels.decode(memoryview(data), 0, len(words))
+
+
+class TestLevelBackends:
+    __test__ = True
+
+    """Tests the level backends against the per-channel code they replace"""
+
+    @pytest.mark.parametrize("buf", [bytes, bytearray])
+    def test_it_decodes_level_words(self, levels, buf):
+        assert tuple(int(w) for w in decode(levels, WORDS, buf)) == WORDS
+
+    def test_it_converts_every_level_word_to_rounded_db(self, levels):
+        db = levels.todb(decode(levels, WORDS))
+        assert [float(d) for d in db] == [fget(i) for i in WORDS]
+
+    def test_it_marks_the_same_channels_changed(self, levels):
+        # a channel only counts as changed if its new level is above -72 dB
+        cache = (65535, 65535, 60000, 50000, 60000, 58000, 0)
+        new = (65535, 65000, 60000, 60000, 50000, 58335, 1)
+        changed = levels.changed(decode(levels, cache), decode(levels, new))
+        assert tuple(bool(c) for c in changed) == tuple(
+            not val for val in comp(cache, new)
+        )
@@ -3,6 +3,8 @@ import pytest
 from tests import data, vban
 from vban_cmd import kinds
 
+pytestmark = pytest.mark.usefixtures("login")
+
 
 class TestPublicPacketLower:
     __test__ = True
@@ -0,0 +1,58 @@
+import pytest
+
+from tests import kind
+from vban_cmd.levels import request_level_backend
+from vban_cmd.meter import Meter
+
+
+@pytest.fixture(params=["array", "numpy"])
+def levels(request):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    return request_level_backend(request.param)
+
+
+def db(levels, strip: float, bus: float) -> tuple:
+    """returns dB levels of every strip and bus channel, as a packet of the backend would"""
+    words = [round(65535 + strip * 100)] * kind.num_strip_levels
+    words += [round(65535 + bus * 100)] * kind.num_bus_levels
+    raw = levels.decode(
+        memoryview(b"".join(w.to_bytes(2, "little") for w in words)), 0, len(words)
+    )
+    return (
+        levels.todb(raw[: kind.num_strip_levels]),
+        levels.todb(raw[kind.num_strip_levels :]),
+    )
+
+
+class TestMeter:
+    __test__ = True
+
+    """Tests the ballistics of the metering engine"""
+
+    def test_it_splits_strips_and_buses(self, levels):
+        meter = Meter(kind, levels, attack=0)
+        meter.update(*db(levels, -10.0, -20.0), now=0.0)
+        meter.update(*db(levels, -10.0, -20.0), now=0.1)
+        strip, bus = meter.values(now=0.1)
+        assert len(strip.level) == kind.num_strip_levels
+        assert len(bus.level) == kind.num_bus_levels
+        assert strip.level[0] == pytest.approx(-10.0)
+        assert bus.level[-1] == pytest.approx(-20.0)
+
+    def test_it_holds_then_decays_peaks(self, levels):
+        meter = Meter(kind, levels, hold=1.0, decay=10.0)
+        meter.update(*db(levels, -6.0, -6.0), now=0.0)
+        meter.update(*db(levels, -60.0, -60.0), now=0.5)
+        assert meter.values(now=0.9)[0].peak[0] == pytest.approx(-6.0)
+        assert meter.values(now=1.5)[0].peak[0] == pytest.approx(-11.0)
+
+    def test_it_clamps_to_floor_and_latches_clip(self, levels):
+        meter = Meter(kind, levels, floor=-72.0)
+        meter.update(*db(levels, 0.0, -200.0), now=0.0)
+        meter.update(*db(levels, -30.0, -200.0), now=0.1)
+        strip, bus = meter.values(now=0.1)
+        assert strip.clip[0] and not bus.clip[0]
+        assert bus.peak[0] == pytest.approx(-72.0)
+        meter.reset_clip()
+        assert not meter.values(now=0.1)[0].clip[0]
@@ -0,0 +1,66 @@
+import pytest
+
+from tests import kind, rt_packet
+from vban_cmd.packet import ParamDiff, VbanRtPacket
+
+
+def packet(commands: dict = None) -> VbanRtPacket:
+    return VbanRtPacket(kind, memoryview(rt_packet(commands)))
+
+
+class TestParamDiff:
+    __test__ = True
+
+    """Tests the bitmaps of parameters that changed between two RT packets"""
+
+    def test_it_is_empty_for_identical_packets(self):
+        diff = packet().pdiff(packet())
+        assert diff == ParamDiff() and not diff
+        assert not packet().pdirty(packet())
+
+    def test_it_compares_pooled_and_received_buffers(self):
+        pooled = VbanRtPacket(kind, memoryview(bytearray(rt_packet())))
+        assert not pooled.pdirty(packet()) and not packet().pdirty(pooled)
+        changed = packet({"bus[0].mute": 1})
+        assert pooled.pdirty(changed) and changed.pdirty(pooled)
+
+    @pytest.mark.parametrize(
+        "cmd,val,field,bitmap",
+        [
+            ("strip[1].mute", 1, "stripstate", 0b10),
+            ("bus[1].mono", 1, "busstate", 0b10),
+            ("strip[1].gain", -6, "stripgainlayers", 0b10),
+            ("strip[1].gainlayer[3]", -6, "stripgainlayers", 0b10 << 24),
+            ("bus[1].gain", -3, "busgain", 0b10),
+            ("strip[0].label", "a", "striplabels", 0b01),
+            ("bus[1].label", "b", "buslabels", 0b10),
+        ],
+    )
+    def test_it_sets_the_bit_of_a_changed_channel(self, cmd, val, field, bitmap):
+        diff = packet({cmd: val}).pdiff(packet())
+        assert diff == ParamDiff(**{field: bitmap})
+
+    def test_it_maps_gainlayers_to_strips(self):
+        diff = packet({"strip[1].gainlayer[3]": -6, "strip[0].gain": -6}).pdiff(
+            packet()
+        )
+        assert diff.gainlayer(0) == 0b01
+        assert diff.gainlayer(3) == 0b10
+        assert diff.gainlayer(7) == 0
+        assert diff.strips == 0b11 and diff.buses == 0
+        assert diff.strip(1) and not diff.strip(2)
+
+    def test_it_maps_bus_fields_to_buses(self):
+        diff = packet({"bus[1].mute": 1, "bus[0].gain": -3}).pdiff(packet())
+        assert diff.buses == 0b11 and diff.strips == 0
+        assert diff.bus(0) and diff.bus(1) and not diff.strip(0)
+
+    def test_it_only_diffs_the_fields_given(self):
+        p0, p1 = packet(), packet({"strip[1].mute": 1, "bus[1].gain": -3})
+        assert p1.pdiff(p0, frozenset({"busgain"})) == ParamDiff(busgain=0b10)
+        assert not p1.pdiff(p0, frozenset({"striplabels"}))
+
+    def test_it_merges_diffs(self):
+        assert ParamDiff(stripstate=0b01) | ParamDiff(
+            stripstate=0b10, busgain=0b01
+        ) == ParamDiff(stripstate=0b11, busgain=0b01)
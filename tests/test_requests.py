@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+import vban_cmd
+from tests import KIND_ID
+from vban_cmd.packet import MAX_PACKET_SIZE
+from vban_cmd.util import split_script
+
+
+@pytest.fixture
+def remote(emulator):
+    with vban_cmd.api(
+        KIND_ID,
+        ip=emulator.host,
+        port=emulator.port,
+        streamname=emulator.streamname,
+        outbound=True,
+    ) as remote:
+        yield remote
+
+
+def received(emulator, requests: int, timeout: float = 1) -> int:
+    """waits for the emulator to receive a number of request packets"""
+    must_end = time.monotonic() + timeout
+    while emulator.requests < requests and time.monotonic() < must_end:
+        time.sleep(0.01)
+    return emulator.requests
+
+
+class TestDatagrams:
+    __test__ = True
+
+    """Tests the number of request packets a script is sent in"""
+
+    def test_it_sends_a_short_script_in_one_packet(self, remote, emulator):
+        assert remote.sendtext("strip[0].mute=1;bus[0].mono=1") == 1
+        assert remote.datagrams_sent == 1
+        assert received(emulator, 1) == 1
+
+    def test_it_sends_a_long_script_in_the_fewest_packets(self, remote, emulator):
+        script = "".join(f"strip[0].gain={-i / 10};" for i in range(200))
+        num = len(split_script(script.encode(), MAX_PACKET_SIZE))
+        assert num > 1
+        assert remote.sendtext(script) == num
+        assert remote.datagrams_sent == num
+        assert received(emulator, num) == num
+        assert emulator.commands == 200
+
+    def test_it_applies_all_targets_together(self, remote, emulator):
+        data = {
+            f"{kls}-{i}": {"mute": True, "label": "x" * 400}
+            for kls, num in (("strip", 2), ("bus", 2))
+            for i in range(num)
+        }
+        num = remote.apply(data)
+        assert num == 2
+        assert remote.datagrams_sent == num
+        assert received(emulator, num) == num
+        assert emulator.commands == 8
+
+    def test_it_buffers_a_script_in_combine_mode(self, remote, emulator, monkeypatch):
+        delays = []
+        monkeypatch.setattr(remote, "_delay", lambda: delays.append(None))
+        with remote.combined():
+            assert remote.sendtext("strip[0].mute=1") is None
+            assert remote.sendtext("bus[0].mono=1") is None
+            assert remote.datagrams_sent == 0
+        assert remote.datagrams_sent == 1 and not delays
+        assert received(emulator, 1) == 1
+        assert emulator.commands == 2
+
+
+class TestPacing:
+    __test__ = True
+
+    """Tests the budget of the send scheduler"""
+
+    def test_it_paces_without_bps_or_pps(self, emulator):
+        with vban_cmd.api(
+            KIND_ID,
+            ip=emulator.host,
+            port=emulator.port,
+            streamname=emulator.streamname,
+            outbound=True,
+            pace=True,
+        ) as remote:
+            assert remote.sender.pacer.bucket.rate == 1000
+            start = time.monotonic()
+            for i in range(300):
+                remote.sendtext(f"strip[0].gain={-i / 10}")
+            assert received(emulator, 300, timeout=2) == 300
+            # a burst of 100 packets, then 1000 per second
+            assert time.monotonic() - start >= 0.18
@@ -0,0 +1,97 @@
+import socket
+import time
+
+import pytest
+
+import vban_cmd
+from tests import KIND_ID
+from vban_cmd import vbancmd
+from vban_cmd.error import VBANCMDConnectionError
+from vban_cmd.resolver import Resolver
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """host to ip, every lookup is logged, a host mapped to None fails to resolve"""
+    hosts = {"remote.local": "127.0.0.2"}
+    log = []
+
+    def gethostbyname(host):
+        log.append(host)
+        if hosts[host] is None:
+            raise socket.gaierror(f"unknown host {host}")
+        return hosts[host]
+
+    monkeypatch.setattr(socket, "gethostbyname", gethostbyname)
+    return hosts, log
+
+
+@pytest.fixture
+def sock():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        yield sock
+
+
+class TestResolver:
+    __test__ = True
+
+    """Tests the cached, ttl bound address of the remote host"""
+
+    def test_it_caches_the_address_for_ttl(self, lookups, sock):
+        _, log = lookups
+        resolver = Resolver("remote.local", 6980, (sock,), ttl=0.05)
+        assert resolver.get() == ("127.0.0.2", 6980)
+        assert resolver.get() == ("127.0.0.2", 6980)
+        assert len(log) == 1 and not resolver.expired
+        time.sleep(0.06)
+        assert resolver.expired
+        resolver.get()
+        assert len(log) == 2
+
+    def test_it_reconnects_when_the_address_changes(self, lookups, sock):
+        hosts, _ = lookups
+        resolver = Resolver("remote.local", 6980, (sock,))
+        resolver.get()
+        assert sock.getpeername() == ("127.0.0.2", 6980)
+        hosts["remote.local"] = "127.0.0.3"
+        resolver.invalidate()
+        assert resolver.get() == ("127.0.0.3", 6980)
+        assert sock.getpeername() == ("127.0.0.3", 6980)
+
+    def test_it_keeps_the_cached_address_if_a_lookup_fails(self, lookups, sock):
+        hosts, log = lookups
+        resolver = Resolver("remote.local", 6980, (sock,))
+        resolver.get()
+        hosts["remote.local"] = None
+        resolver.invalidate()
+        assert resolver.get() == ("127.0.0.2", 6980)
+        # and is cached for another ttl
+        assert not resolver.expired
+        assert resolver.stats["failures"] == 1 and len(log) == 2
+
+    def test_it_raises_if_the_first_lookup_fails(self, lookups, sock):
+        hosts, _ = lookups
+        hosts["remote.local"] = None
+        resolver = Resolver("remote.local", 6980, (sock,))
+        with pytest.raises(VBANCMDConnectionError, match="unable to resolve"):
+            resolver.get()
+        assert resolver.expired
+
+    def test_a_failed_send_resolves_the_host_again(self, lookups, monkeypatch):
+        hosts, log = lookups
+        sent = []
+
+        def sendmsg(sock, buffers):
+            # the first send fails, as if the cached address went stale
+            if not sent:
+                sent.append(None)
+                raise OSError("network is unreachable")
+            sent.append(sock.getpeername())
+
+        monkeypatch.setattr(vbancmd, "sendmsg", sendmsg)
+        remote = vban_cmd.api(KIND_ID, ip="remote.local", outbound=True)
+        remote.resolver.get()
+        hosts["remote.local"] = "127.0.0.3"
+        remote._transmit(b"strip[0].mute=1;")
+        assert len(log) == 2
+        assert sent == [None, ("127.0.0.3", remote.port)]
@@ -0,0 +1,48 @@
+from vban_cmd.subject import Subject
+
+
+class TestSubject:
+    __test__ = True
+
+    """Tests the dispatch index of observers"""
+
+    def test_it_indexes_the_events_up_front(self):
+        subject = Subject()
+
+        def on_pdirty():
+            pass
+
+        subject.add(on_pdirty)
+        assert subject._index == {
+            "pdirty": ((on_pdirty, on_pdirty, False),),
+            "ldirty": (),
+        }
+
+    def test_it_notifies_an_observer_added_after_a_notification(self):
+        subject, events = Subject(), []
+        subject.notify("pdirty")
+
+        def on_pdirty():
+            events.append("pdirty")
+
+        subject.add(on_pdirty)
+        subject.notify("pdirty")
+        assert events == ["pdirty"]
+        subject.remove(on_pdirty)
+        subject.notify("pdirty")
+        assert events == ["pdirty"]
+
+    def test_it_times_callbacks_only_if_asked(self):
+        subject = Subject()
+
+        def on_pdirty():
+            raise ValueError("observer error")
+
+        subject.add(on_pdirty)
+        subject.notify("pdirty")
+        assert subject.stats == {}
+        subject.timing = True
+        subject.notify("pdirty")
+        stats = subject.stats[on_pdirty]
+        assert stats["calls"] == 1 and stats["errors"] == 1
+        assert stats["latency"]["count"] == 1
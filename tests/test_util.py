@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from vban_cmd.util import BufferPool, TokenBucket, split_script
+
+
+class TestSplitScript:
+    __test__ = True
+
+    """Tests splitting a script into request packets"""
+
+    def test_it_returns_a_script_that_fits_unchanged(self):
+        script = b"strip[0].mute=1;bus[0].mono=1"
+        assert split_script(script, len(script)) == [script]
+
+    def test_it_splits_at_the_exact_fit_boundary(self):
+        script = b"a=1;" * 5
+        assert split_script(script + b"b=1;", len(script)) == [script, b"b=1;"]
+        assert split_script(script, len(script) - 1) == [b"a=1;" * 4, b"a=1;"]
+
+    def test_it_sends_an_oversize_command_on_its_own(self):
+        label = b'strip[0].label="' + b"x" * 40 + b'";'
+        assert split_script(b"a=1;" + label + b"b=1;", 20) == [
+            b"a=1;",
+            label,
+            b"b=1;",
+        ]
+
+    def test_it_terminates_the_last_command(self):
+        assert split_script(b"a=1;b=2", 4) == [b"a=1;", b"b=2;"]
+
+    def test_it_skips_empty_commands(self):
+        assert split_script(b"a=1;;;b=2;", 4) == [b"a=1;", b"b=2;"]
+
+
+class TestTokenBucket:
+    __test__ = True
+
+    """Tests the token bucket that paces outgoing packets"""
+
+    def test_it_allows_a_burst_of_capacity(self):
+        bucket = TokenBucket(10, 3)
+        assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+
+    def test_it_returns_the_wait_for_a_token(self):
+        bucket = TokenBucket(10, 1)
+        bucket.take()
+        assert bucket.take() == pytest.approx(0.1, abs=0.01)
+        # tokens taken on credit are paid back in order
+        assert bucket.take() == pytest.approx(0.2, abs=0.01)
+
+    def test_it_takes_n_tokens(self):
+        bucket = TokenBucket(1000, 1500)
+        assert bucket.take(1500) == 0
+        assert bucket.take(500) == pytest.approx(0.5, abs=0.01)
+
+    def test_it_refills_at_rate(self):
+        bucket = TokenBucket(100, 1)
+        bucket.take()
+        time.sleep(0.02)
+        assert bucket.take() == 0
+
+
+class TestBufferPool:
+    __test__ = True
+
+    """Tests the pool of preallocated receive buffers"""
+
+    def test_it_reuses_released_buffers_as_late_as_possible(self):
+        pool = BufferPool(2, 8)
+        a, b = pool.acquire(), pool.acquire()
+        pool.release(b)
+        pool.release(a)
+        assert pool.acquire() is b and pool.acquire() is a
+        assert pool.allocated == 2
+
+    def test_it_grows_when_it_runs_dry(self):
+        pool = BufferPool(1, 8)
+        pool.acquire()
+        assert len(pool.acquire()) == 8
+        assert pool.allocated == 2 and len(pool) == 0
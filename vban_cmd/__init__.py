@@ -1,3 +1,4 @@
+from .factory import request_async_vbancmd_obj as async_api
 from .factory import request_vbancmd_obj as api
 
-__ALL__ = ["api"]
+__ALL__ = ["api", "async_api"]
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import socket
+
+from .error import VBANCMDConnectionError, VBANCMDError
+from .packet import SubscribeHeader
+from .util import Socket
+from .vbancmd import VbanCmd
+from .worker import Pacer, PacketHandler
+
+logger = logging.getLogger(__name__)
+
+
+class RtPacketProtocol(asyncio.DatagramProtocol):
+    """Receives RT packets for an AsyncVbanCmd, packets are handled on the event loop."""
+
+    def __init__(self, remote):
+        self._remote = remote
+        self.handler = remote.handler
+        self.logger = logger.getChild(self.__class__.__name__)
+        self.ready = remote._loop.create_future()
+
+    def datagram_received(self, data: bytes, addr):
+        if self.handler.intake(data) is None:
+            return
+        if not self.ready.done():
+            self.handler.prime(data)
+            self.ready.set_result(None)
+            return
+        for event in self.handler.handle(data):
+            self._remote._dispatch(event)
+        self.handler.meter()
+
+    def error_received(self, exc):
+        self.logger.debug(f"{type(exc).__name__}: {exc}")
+
+
+class RequestProtocol(asyncio.DatagramProtocol):
+    """Send only protocol for the request transport."""
+
+    def __init__(self):
+        self.logger = logger.getChild(self.__class__.__name__)
+
+    def error_received(self, exc):
+        # port unreachable reported for an earlier datagram
+        self.logger.debug(f"{type(exc).__name__}: {exc}")
+
+
+class AsyncVbanCmd(VbanCmd):
+    """
+    Asyncio variant of VbanCmd
+
+    RT packets are received by a DatagramProtocol and observers are notified on the event loop.
+    No threads are started, so one loop may drive many remotes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = None
+        self._transport = None
+        self._rt_transport = None
+        self._pacer = None
+        self._queued = None
+        self._drained = None
+        self._resolving = None
+        self._tasks = []
+        self._listeners = []
+
+    async def __aenter__(self):
+        await self.alogin()
+        return self
+
+    def login(self) -> None:
+        raise VBANCMDError(
+            f"{type(self).__name__} is logged in with 'async with' or 'await alogin()'"
+        )
+
+    async def alogin(self) -> None:
+        """
+        Opens the request and RT packet endpoints on the running loop (unless in outbound mode)
+
+        Starts the sender task if outgoing packets are paced.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._buffer.schedule = self._loop.call_later
+        await self._resolve()
+        for sock in self.socks:
+            sock.setblocking(False)
+        self._transport, _ = await self._loop.create_datagram_endpoint(
+            RequestProtocol, sock=self.socks[Socket.request]
+        )
+
+        if self.pace or self.pps:
+            self._pacer = Pacer(self, on_drop=self._on_drop)
+            self._outgoing = self._pacer.queue
+            self._queued, self._drained = asyncio.Event(), asyncio.Event()
+            self._drained.set()
+            self._tasks.append(self._loop.create_task(self._pace()))
+
+        if not self.outbound:
+            self.event.info()
+
+            self.handler = PacketHandler(self, self.capture)
+            # datagrams are delivered as bytes objects, there are no buffers to pool
+            self.handler.pool = None
+            host = await self._loop.run_in_executor(
+                None, socket.gethostbyname, socket.gethostname()
+            )
+            if self.rcvbuf:
+                self.socks[Socket.response].setsockopt(
+                    socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf
+                )
+            self.socks[Socket.response].bind((host, self.port))
+            self._rt_transport, protocol = await self._loop.create_datagram_endpoint(
+                lambda: RtPacketProtocol(self), sock=self.socks[Socket.response]
+            )
+            self._tasks.append(self._loop.create_task(self._subscribe()))
+            try:
+                await asyncio.wait_for(protocol.ready, self.timeout)
+            except asyncio.TimeoutError as e:
+                await self.alogout()
+                ERR_MSG = f"timeout waiting for RtPacket from {self.ip}"
+                self.logger.error(ERR_MSG)
+                raise VBANCMDConnectionError(ERR_MSG) from e
+
+        self.logger.info(
+            "Successfully logged into VBANCMD {kind} with ip='{ip}', port={port}, streamname='{streamname}'".format(
+                **self.__dict__
+            )
+        )
+
+    async def _subscribe(self):
+        """fire a subscription packet every 10 seconds"""
+        packet = SubscribeHeader()
+        while True:
+            if self.resolver.expired:
+                await self._resolve()
+            try:
+                self.socks[Socket.register].send(packet.header)
+            except (BlockingIOError, ConnectionRefusedError):
+                self.logger.debug(f"{self.ip} refused an RT packet registration")
+            packet.framecounter += 1
+            await asyncio.sleep(10)
+
+    async def _resolve(self) -> tuple:
+        """looks up the host on an executor thread, the sockets are (re)connected on the loop"""
+        ip = await self._loop.run_in_executor(None, self.resolver.lookup)
+        return self.resolver.update(ip)
+
+    async def _refresh(self):
+        """resolves an expired address in the background, sends use the cached address meanwhile"""
+        try:
+            await self._resolve()
+        except (VBANCMDConnectionError, OSError) as e:
+            self.logger.error(f"{type(e).__name__}: {e}")
+        finally:
+            self._resolving = None
+
+    async def _pace(self):
+        """sends queued request packets, paced by a token bucket"""
+        while True:
+            await self._queued.wait()
+            while (wait := self._pacer.due()) is not None:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if (fut := self._pacer.send()) is not None and not fut.done():
+                    fut.set_result(None)
+            self._queued.clear()
+            self._drained.set()
+
+    def _on_drop(self, cmd, fut):
+        """a stale paced command was dropped, its future is done without sending it"""
+        self.cache.pop(cmd, None)
+        if not fut.done():
+            fut.set_result(None)
+
+    def _send(self, payload: bytes, key: str = None) -> asyncio.Future:
+        """
+        Sends a request packet, through the sender task if outgoing packets are paced.
+
+        Returns a future that is done once the packet has been sent, or replaced by a newer packet that has.
+        """
+        fut = self._loop.create_future()
+        if self._outgoing is not None:
+            fut = self._outgoing.put(payload, key, fut)
+            self._drained.clear()
+            self._queued.set()
+        else:
+            self._transmit(payload)
+            fut.set_result(None)
+        return fut
+
+    def _transmit(self, payload: bytes):
+        """Sends a request packet through the request transport."""
+        if self.resolver.expired and self._resolving is None:
+            self._resolving = self._loop.create_task(self._refresh())
+        self._transport.sendto(self.packet_request.header + payload)
+        self.packet_request.framecounter += 1
+        self.datagrams_sent += 1
+        self.bytes_sent += len(self.packet_request.header) + len(payload)
+
+    def _set_rt(self, cmd: str, val) -> asyncio.Future:
+        """
+        Sends a string request command over a network.
+
+        Returns a future that is done once the command has been sent (or buffered, in combine mode).
+        """
+        if (fut := super()._set_rt(cmd, val)) is None:
+            fut = self._loop.create_future()
+            fut.set_result(None)
+        return fut
+
+    async def set(self, cmd: str, val):
+        """Sets a parameter by its command path, for example await vban.set('strip[0].gain', -6.0)"""
+        await self._set_rt(cmd, val)
+
+    async def drain(self) -> None:
+        """Flushes the write-combining buffer and waits for any paced packets to be sent."""
+        self.flush()
+        if self._outgoing is not None:
+            await self._drained.wait()
+
+    def stopped(self):
+        return self._rt_transport is None
+
+    def _delay(self):
+        """Never blocks the event loop."""
+
+    def clear_dirty(self) -> None:
+        """pdirty cannot clear while the event loop is blocked, sync getters do not wait."""
+
+    def _dispatch(self, event: str):
+        self.handler.dispatch(event)
+        # at most one pending event of each kind per listener
+        for pending, queue in self._listeners:
+            if event not in pending:
+                pending.add(event)
+                queue.put_nowait(event)
+
+    async def events(self):
+        """
+        Async iterator of pdirty/ldirty events
+
+        Events of a kind already pending are coalesced, the iterator ends on logout.
+        """
+        listener = (set(), asyncio.Queue())
+        self._listeners.append(listener)
+        pending, queue = listener
+        try:
+            while (event := await queue.get()) is not None:
+                pending.discard(event)
+                yield event
+        finally:
+            self._listeners.remove(listener)
+
+    async def alogout(self) -> None:
+        await self.drain()
+        for _, queue in self._listeners:
+            queue.put_nowait(None)
+        if self._resolving is not None:
+            self._tasks.append(self._resolving)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._pacer = self._outgoing = None
+        for transport in (self._rt_transport, self._transport):
+            if transport is not None:
+                transport.close()
+        self._rt_transport = self._transport = None
+        # the transports close their sockets on the next iteration
+        await asyncio.sleep(0)
+        if self.handler is not None:
+            self.handler.close()
+        self.subject.shutdown()
+        [sock.close() for sock in self.socks]
+        self.logger.info(f"{type(self).__name__}: Successfully logged out of {self}")
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback) -> None:
+        await self.alogout()
@@ -0,0 +1,227 @@
+import itertools
+import logging
+import threading
+import time
+
+from .packet import MAX_PACKET_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def expiry(deadlines: dict, key):
+    """returns when a value for a command path goes stale, if a deadline is configured for it"""
+    if not deadlines or not isinstance(key, str):
+        return
+    param = key.rsplit(".", 1)[-1].split("[")[0].lower()
+    if (ttl := deadlines.get(key, deadlines.get(param))) is not None:
+        return time.monotonic() + ttl
+
+
+class Flusher:
+    """
+    Flush timer of a write-combining buffer, run by one long-lived thread
+
+    Called as schedule(interval, callback), arming it again replaces the armed timer.
+    The thread is started when first armed and runs until close().
+    """
+
+    def __init__(self):
+        self.logger = logger.getChild(self.__class__.__name__)
+        self._cond = threading.Condition()
+        self._due = None
+        self._callback = None
+        self._thread = None
+
+    def __call__(self, interval: float, callback) -> "Flusher":
+        with self._cond:
+            self._due = time.monotonic() + interval
+            self._callback = callback
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="flusher", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+        return self
+
+    def cancel(self):
+        with self._cond:
+            self._due = None
+
+    def close(self):
+        """disarms the timer and stops the thread, arming it again starts a new one"""
+        with self._cond:
+            self._due = None
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self):
+        this = threading.current_thread()
+        while True:
+            with self._cond:
+                while True:
+                    if self._thread is not this:
+                        return
+                    if self._due is not None:
+                        if (wait := self._due - time.monotonic()) <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                callback, self._due = self._callback, None
+            try:
+                callback()
+            except Exception as e:
+                self.logger.exception(f"{type(e).__name__}: {e}")
+
+
+class CommandBuffer:
+    """
+    Write-combining buffer for request commands
+
+    Buffers cmd=val; fragments and flushes them as a single datagram when
+    the next fragment would not fit, when interval elapses or on flush().
+
+    Fragments are keyed by command path, a newer fragment replaces an unsent older one.
+    Fragments that outlive their deadline are dropped rather than sent.
+
+    Fragments larger than a packet are split at ; boundaries by send.
+
+    schedule(interval, callback) arms the flush timer, it defaults to a Flusher.
+    """
+
+    def __init__(
+        self,
+        send,
+        interval: float,
+        deadlines: dict = None,
+        on_drop=None,
+        schedule=None,
+    ):
+        self._send = send
+        self._flusher = Flusher()
+        self.schedule = schedule or self._flusher
+        self.interval = interval
+        self.deadlines = deadlines or {}
+        self._on_drop = on_drop
+        self.logger = logger.getChild(self.__class__.__name__)
+        self._pending = {}
+        self._size = 0
+        self._seq = itertools.count()
+        self._timer = None
+        self._lock = threading.RLock()
+        self.coalesced = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, fragment: bytes, key: str = None):
+        """
+        buffers a fragment, flushing first if it would overflow the packet
+
+        fragments without a key are never coalesced
+        """
+        with self._lock:
+            if key is None:
+                key = next(self._seq)
+            elif key in self._pending:
+                self._size -= len(self._pending.pop(key)[0])
+                self.coalesced += 1
+            if self._size + len(fragment) > MAX_PACKET_SIZE:
+                self.flush()
+            self._pending[key] = (fragment, expiry(self.deadlines, key))
+            self._size += len(fragment)
+            if self._timer is None and self.interval:
+                self._timer = self.schedule(self.interval, self.flush)
+
+    def flush(self):
+        """sends all buffered fragments that are still current as one datagram"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            now = time.monotonic()
+            fragments = []
+            for key, (fragment, deadline) in self._pending.items():
+                if deadline is not None and now > deadline:
+                    self.dropped += 1
+                    self.logger.debug(f"dropping stale {fragment}")
+                    if self._on_drop:
+                        self._on_drop(key)
+                else:
+                    fragments.append(fragment)
+            self._pending.clear()
+            self._size = 0
+            if fragments:
+                payload = b"".join(fragments)
+                self.logger.debug(f"flushing {len(payload)} bytes")
+                self._send(payload)
+
+    def close(self):
+        """flushes, then stops the flush thread"""
+        self.flush()
+        self._flusher.close()
+
+
+class SendQueue:
+    """
+    Request packets waiting for the send scheduler
+
+    Packets are keyed by command path, a newer packet replaces an unsent older one and takes its place in line.
+    Packets that outlive their deadline are dropped rather than sent.
+
+    Each packet may carry a waiter (a future, for example), a replacing packet inherits it.
+    Not thread safe, callers synchronise.
+    """
+
+    def __init__(self, deadlines: dict = None, on_drop=None):
+        self.deadlines = deadlines or {}
+        self._on_drop = on_drop
+        self.logger = logger.getChild(self.__class__.__name__)
+        self._pending = {}
+        self._seq = itertools.count()
+        self.coalesced = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, payload: bytes, key: str = None, waiter=None):
+        """
+        queues a packet, packets without a key are never coalesced
+
+        returns the waiter of the queued packet
+        """
+        if key is None:
+            key = next(self._seq)
+        elif key in self._pending:
+            waiter = self._pending[key][2]
+            self.coalesced += 1
+        self._pending[key] = (payload, expiry(self.deadlines, key), waiter)
+        return waiter
+
+    def peek(self):
+        """returns the payload of the oldest packet, or None if there is none"""
+        return next(iter(self._pending.values()))[0] if self._pending else None
+
+    def pop(self):
+        """
+        Returns (payload, waiter) of the oldest packet that is still current, or None if there is none.
+
+        Stale packets are dropped, on_drop is called with their key and waiter.
+        """
+        now = time.monotonic()
+        while self._pending:
+            key = next(iter(self._pending))
+            payload, deadline, waiter = self._pending.pop(key)
+            if deadline is None or now <= deadline:
+                return payload, waiter
+            self.dropped += 1
+            self.logger.debug(f"dropping stale {payload}")
+            if self._on_drop:
+                self._on_drop(key, waiter)
@@ -45,11 +45,11 @@ class Bus(IRemote):
 
     def fadeto(self, target: float, time_: int):
         self.setter("FadeTo", f"({target}, {time_})")
-        time.sleep(self._remote.DELAY)
+        self._remote._delay()
 
     def fadeby(self, change: float, time_: int):
         self.setter("FadeBy", f"({change}, {time_})")
-        time.sleep(self._remote.DELAY)
+        self._remote._delay()
 
 
 class BusEQ(IRemote):
@@ -99,20 +99,9 @@ class BusLevel(IRemote):
     def getter(self):
         """Returns a tuple of level values for the channel."""
 
-        def fget(i):
-            return round((((1 << 16) - 1) - i) * -0.01, 1)
-
         if not self._remote.stopped() and self._remote.event.ldirty:
-            return tuple(
-                fget(i)
-                for i in self._remote.cache["bus_level"][self.range[0] : self.range[-1]]
-            )
-        return tuple(
-            fget(i)
-            for i in self._remote._get_levels(self.public_packet)[1][
-                self.range[0] : self.range[-1]
-            ]
-        )
+            return self._remote.cache["bus_level_db"][self.range[0] : self.range[-1]]
+        return self.public_packet.outputlevels_db[self.range[0] : self.range[-1]]
 
     @property
     def identifier(self) -> str:
@@ -0,0 +1,147 @@
+import logging
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Iterator
+
+from .error import VBANCMDError
+from .packet import RT_PACKET_SIZE
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"VBRT"
+VERSION = 1
+# magic, version, packet size, capture start (wall clock), record count
+HEADER = struct.Struct("<4sHHdQ")
+COUNT = struct.Struct("<Q")
+COUNT_OFFSET = HEADER.size - COUNT.size
+# receive timestamp (monotonic), followed by the raw packet
+STAMP = struct.Struct("<d")
+RECORD_SIZE = STAMP.size + RT_PACKET_SIZE
+
+
+class CaptureWriter:
+    """
+    Appends raw RT packets with their receive timestamps to a memory-mapped capture file
+
+    Records are fixed size. The file grows by chunk bytes at a time and is truncated to its records on close.
+    The record count in the header is kept current, so a capture cut short is still readable.
+    """
+
+    def __init__(self, filepath, chunk: int = 1 << 20):
+        self.filepath = Path(filepath)
+        self.chunk = max(chunk, RECORD_SIZE)
+        self.logger = logger.getChild(self.__class__.__name__)
+        self._file = open(self.filepath, "w+b")
+        self._file.truncate(HEADER.size + self.chunk)
+        self._mm = mmap.mmap(self._file.fileno(), HEADER.size + self.chunk)
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, RT_PACKET_SIZE, time.time(), 0)
+        self._offset = HEADER.size
+        self.count = 0
+
+    def _grow(self):
+        size = len(self._mm) + self.chunk
+        self._mm.close()
+        self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+
+    def write(self, data, stamp: float = None):
+        """appends a packet, stamped with time.monotonic() unless a stamp is given"""
+        if self._offset + RECORD_SIZE > len(self._mm):
+            self._grow()
+        STAMP.pack_into(
+            self._mm, self._offset, time.monotonic() if stamp is None else stamp
+        )
+        start = self._offset + STAMP.size
+        self._mm[start : start + RT_PACKET_SIZE] = data[:RT_PACKET_SIZE]
+        self._offset += RECORD_SIZE
+        self.count += 1
+        COUNT.pack_into(self._mm, COUNT_OFFSET, self.count)
+
+    def close(self):
+        self._mm.flush()
+        self._mm.close()
+        self._file.truncate(self._offset)
+        self._file.close()
+        self.logger.info(f"captured {self.count} packets to {self.filepath}")
+
+
+class CaptureReader:
+    """Reads a capture file, records are memoryviews of the mapped file"""
+
+    def __init__(self, filepath):
+        self.filepath = Path(filepath)
+        with open(self.filepath, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, size, self.started, self.count = HEADER.unpack_from(
+                self._mm
+            )
+        except struct.error as e:
+            self._mm.close()
+            raise VBANCMDError(f"{self.filepath} is not an RT packet capture") from e
+        if magic != MAGIC or version != VERSION or size != RT_PACKET_SIZE:
+            self._mm.close()
+            raise VBANCMDError(f"{self.filepath} is not an RT packet capture")
+        self.count = min(self.count, (len(self._mm) - HEADER.size) // RECORD_SIZE)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[tuple]:
+        """yields (timestamp, packet) for each record"""
+        view = memoryview(self._mm)
+        try:
+            for offset in range(
+                HEADER.size, HEADER.size + self.count * RECORD_SIZE, RECORD_SIZE
+            ):
+                start = offset + STAMP.size
+                yield (
+                    STAMP.unpack_from(self._mm, offset)[0],
+                    view[start : start + RT_PACKET_SIZE],
+                )
+        finally:
+            view.release()
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+
+def replay(handler, filepath, speed: float = 1.0) -> int:
+    """
+    Feeds a capture file through a packet handler's decode, diff and dispatch pipeline.
+
+    speed: 1.0 for the original timing, N for N times faster, 0 for as fast as possible.
+    Returns the number of packets replayed.
+    """
+    num = 0
+    with CaptureReader(filepath) as reader:
+        start = origin = None
+        for stamp, view in reader:
+            # a private copy, as if it had been received
+            data = view.tobytes()
+            view.release()
+            if handler.intake(data) is None:
+                continue
+            if origin is None:
+                origin, start = stamp, time.monotonic()
+                handler.prime(data)
+            else:
+                if (
+                    speed
+                    and (wait := start + (stamp - origin) / speed - time.monotonic())
+                    > 0
+                ):
+                    time.sleep(wait)
+                for event in handler.handle(data):
+                    handler.dispatch(event)
+                handler.meter()
+            num += 1
+    return num
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+
+from .util import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class EventChannel:
+    """
+    Bounded event channel between the Producer and Updater threads
+
+    Holds at most one pending event of each kind, with the newest packet attached.
+    wait times each event from its first put() to get(), coalesced events included.
+
+    overflow decides what happens to an event whose kind is already pending:
+        coalesce: the pending event takes the newest packet, pdiffs are merged.
+        drop: the newer event is dropped.
+        block: the producer waits until the pending event has been taken.
+    """
+
+    POLICIES = ("coalesce", "drop", "block")
+
+    def __init__(self, overflow: str = "coalesce"):
+        if overflow not in self.POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        self.overflow = overflow
+        self.logger = logger.getChild(self.__class__.__name__)
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._busy = False
+        self.coalesced = 0
+        self.dropped = 0
+        self.wait = Histogram()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, event: str, packet, pdiff=None):
+        """queues an event with the packet that raised it, applying the overflow policy"""
+        stamp = time.perf_counter()
+        with self._cond:
+            if event in self._pending:
+                match self.overflow:
+                    case "drop":
+                        self.dropped += 1
+                        return
+                    case "block":
+                        self._cond.wait_for(
+                            lambda: event not in self._pending or self._closed
+                        )
+                    case "coalesce":
+                        _, prev, stamp = self._pending[event]
+                        if prev is not None and pdiff is not None:
+                            pdiff = prev | pdiff
+                        self.coalesced += 1
+            self._pending[event] = (packet, pdiff, stamp)
+            self._cond.notify_all()
+
+    def get(self):
+        """
+        Blocks until an event is pending.
+
+        Returns (event, packet, pdiff), or None once the channel is closed and empty.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed)
+            if not self._pending:
+                return
+            event = next(iter(self._pending))
+            packet, pdiff, stamp = self._pending.pop(event)
+            self.wait.record(time.perf_counter() - stamp)
+            self._busy = True
+            self._cond.notify_all()
+            return event, packet, pdiff
+
+    def done(self):
+        """marks the event returned by get() as dispatched"""
+        with self._cond:
+            self._busy = False
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        Blocks until no events are pending or being dispatched.
+
+        Returns False if timeout elapsed first.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not (self._pending or self._busy) or self._closed, timeout
+            )
+
+    def close(self):
+        """wakes any waiters, get() returns None once pending events are taken"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
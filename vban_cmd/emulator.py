@@ -0,0 +1,392 @@
+import argparse
+import ipaddress
+import logging
+import math
+import re
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from .iremote import Modes
+from .kinds import KindId, request_kind_map
+from .packet import (
+    FRAMECOUNTER,
+    HEADER_SIZE,
+    RT_LAYOUT,
+    RT_PACKET_SIZE,
+    VBAN_PROTOCOL_SERVICE,
+    VBAN_PROTOCOL_TXT,
+    VBAN_SERVICE_RTPACKETREGISTER,
+    VbanRtPacketHeader,
+)
+
+logger = logging.getLogger(__name__)
+
+COMMAND = re.compile(r"(strip|bus)\[(\d+)\]\.(.+)", re.IGNORECASE)
+GAIN_RANGE = (-60.0, 12.0)
+BUS_MODES = (
+    "amix",
+    "repeat",
+    "bmix",
+    "composite",
+    "tvmix",
+    "upmix21",
+    "upmix41",
+    "upmix61",
+    "centeronly",
+    "lfeonly",
+    "rearonly",
+)
+
+
+def _word(db: float) -> int:
+    """encodes a dB value as the signed dB * 100 word of an RT packet"""
+    return round(db * 100) & 0xFFFF
+
+
+class Model:
+    """
+    The RT packet state of a Voicemeeter kind
+
+    Request commands for fields carried by RT packets (states, gains, labels) update the model,
+    any other command is stored in params as its raw value.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.reset()
+
+    def reset(self):
+        self.stripstate = [0] * 8
+        self.busstate = [0] * 8
+        self.gainlayers = [[0.0] * 8 for _ in range(8)]
+        self.busgain = [0.0] * 8
+        self.striplabels = [""] * 8
+        self.buslabels = [""] * 8
+        self.params = {}
+
+    @staticmethod
+    def _gain(gain: float) -> float:
+        return min(max(gain, GAIN_RANGE[0]), GAIN_RANGE[1])
+
+    @staticmethod
+    def _set_bit(states: list, index: int, bit: int, val: str):
+        if float(val):
+            states[index] |= bit
+        else:
+            states[index] &= ~bit
+
+    @staticmethod
+    def _fade(val: str) -> float:
+        """returns the target or change of a '(value, time)' fade argument"""
+        return float(val.strip("()").split(",")[0])
+
+    def apply(self, cmd: str, val: str) -> bool:
+        """
+        Applies a single request command.
+
+        Returns True iff a field carried by RT packets may have changed.
+        """
+        if not (m := COMMAND.fullmatch(cmd)):
+            self.params[cmd] = val
+            return False
+        channel, index, param = m[1].lower(), int(m[2]), m[3].lower()
+        if index >= (self.kind.num_strip if channel == "strip" else self.kind.num_bus):
+            raise ValueError(f"{cmd} is out of range for {self.kind}")
+        if channel == "strip":
+            return self._apply_strip(index, param, val) or self._store(cmd, val)
+        return self._apply_bus(index, param, val) or self._store(cmd, val)
+
+    def _store(self, cmd: str, val: str) -> bool:
+        self.params[cmd] = val
+        return False
+
+    def _apply_strip(self, index: int, param: str, val: str) -> bool:
+        if param in ("mute", "solo", "mono", "mc"):
+            self._set_bit(self.stripstate, index, getattr(Modes, f"_{param}"), val)
+        elif hasattr(Modes, f"_bus{param}") and re.fullmatch(r"[ab]\d", param):
+            self._set_bit(self.stripstate, index, getattr(Modes, f"_bus{param}"), val)
+        elif param == "gain":
+            self.gainlayers[0][index] = self._gain(float(val))
+        elif m := re.fullmatch(r"gainlayer\[([0-7])\]", param):
+            self.gainlayers[int(m[1])][index] = self._gain(float(val))
+        elif param == "fadeto":
+            self.gainlayers[0][index] = self._gain(self._fade(val))
+        elif param == "fadeby":
+            self.gainlayers[0][index] = self._gain(
+                self.gainlayers[0][index] + self._fade(val)
+            )
+        elif param == "label":
+            self.striplabels[index] = val.strip('"')
+        else:
+            return False
+        return True
+
+    def _apply_bus(self, index: int, param: str, val: str) -> bool:
+        if param in ("mute", "mono", "sel", "monitor"):
+            self._set_bit(self.busstate, index, getattr(Modes, f"_{param}"), val)
+        elif param in ("eq.on", "eq.ab"):
+            self._set_bit(self.busstate, index, getattr(Modes, f"_{param[3:]}"), val)
+        elif param.startswith("mode."):
+            mode = param[5:]
+            if mode != "normal" and mode not in BUS_MODES:
+                return False
+            if float(val):
+                self.busstate[index] &= ~Modes._mask
+                if mode != "normal":
+                    self.busstate[index] |= getattr(Modes, f"_{mode}")
+        elif param == "gain":
+            self.busgain[index] = self._gain(float(val))
+        elif param == "fadeto":
+            self.busgain[index] = self._gain(self._fade(val))
+        elif param == "fadeby":
+            self.busgain[index] = self._gain(self.busgain[index] + self._fade(val))
+        elif param == "label":
+            self.buslabels[index] = val.strip('"')
+        else:
+            return False
+        return True
+
+    def pack_into(self, buf: bytearray):
+        """writes the parameter fields of an RT packet"""
+        for name, vals in (
+            ("stripState", self.stripstate),
+            ("busState", self.busstate),
+            (
+                "stripGaindB100Layer",
+                [_word(gain) for layer in self.gainlayers for gain in layer],
+            ),
+            ("busGaindB100", [_word(gain) for gain in self.busgain]),
+            ("stripLabelUTF8c60", [label.encode()[:60] for label in self.striplabels]),
+            ("busLabelUTF8c60", [label.encode()[:60] for label in self.buslabels]),
+        ):
+            offset, fmt = RT_LAYOUT[name]
+            fmt.pack_into(buf, offset, *vals)
+
+
+class Emulator(threading.Thread):
+    """
+    A local stand-in for the Voicemeeter RT packet service of a kind
+
+    Accepts RT packet registrations and streams RT packets with synthetic levels to each registered host at rate
+    packets per second, until its registration times out. Request packets for streamname update the model.
+
+    The emulator and the client must bind different addresses. A client binds its own host address (often 127.0.0.1),
+    so by default the emulator binds 127.0.0.2.
+
+    RT packets are sent to reply_host. By default a registration from another machine is answered at its source address,
+    a local one at the host address a client binds, socket.gethostbyname(socket.gethostname()), which need not be the
+    loopback address the registration came from (127.0.1.1 or a private address on many hosts).
+    """
+
+    def __init__(
+        self,
+        kind_id: str = "banana",
+        host: str = "127.0.0.2",
+        port: int = 6980,
+        streamname: str = "Command1",
+        rate: float = 50,
+        levels: bool = True,
+        version: tuple = None,
+        rcvbuf: int = 1 << 20,
+        reply_host: str = None,
+    ):
+        super().__init__(name="emulator", daemon=True)
+        self.kind = request_kind_map(kind_id)
+        self.host = host
+        self.port = port
+        self.streamname = streamname
+        self.rate = rate
+        self.levels = levels
+        self.reply_host = reply_host
+        self.logger = logger.getChild(self.__class__.__name__)
+        self.model = Model(self.kind)
+        self.subscribers = {}
+        self.requests = 0
+        self.commands = 0
+        self.sent = 0
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = True
+        self._start = time.monotonic()
+        self._streamname = streamname.encode() + bytes(16 - len(streamname))
+
+        self._packet = bytearray(RT_PACKET_SIZE)
+        self._packet[:HEADER_SIZE] = VbanRtPacketHeader().header
+        kind_id = KindId[self.kind.name.upper()].value
+        for name, vals in (
+            ("voicemeeterType", (kind_id,)),
+            ("buffersize", (512,)),
+            ("voicemeeterVersion", tuple(reversed(version or (kind_id, 1, 0, 0)))),
+            ("samplerate", (48000,)),
+        ):
+            offset, fmt = RT_LAYOUT[name]
+            fmt.pack_into(self._packet, offset, *vals)
+        # the strip/bus index of each level channel
+        self._strip_channels = tuple(
+            i
+            for i in range(self.kind.num_strip)
+            for _ in range(2 if i < self.kind.phys_in else 8)
+        )
+        self._bus_channels = tuple(i // 8 for i in range(self.kind.num_bus_levels))
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # absorbs bursts of request packets while an RT packet is being built
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    def stop(self):
+        """stops streaming and closes the socket"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.sock.close()
+
+    def _receive(self):
+        """handles every datagram waiting on the socket"""
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionRefusedError):
+                return
+            if len(data) < HEADER_SIZE or not data.startswith(b"VBAN"):
+                continue
+            if (
+                data[4] == VBAN_PROTOCOL_SERVICE
+                and data[6] == VBAN_SERVICE_RTPACKETREGISTER
+            ):
+                host = self._reply_to(addr[0])
+                if host not in self.subscribers:
+                    self.logger.info(
+                        f"{addr[0]} registered for RT packets, sending to {host}"
+                    )
+                # format_bit carries the registration timeout in seconds
+                self.subscribers[host] = time.monotonic() + (data[7] or 1)
+            elif (
+                data[4] & 0xE0 == VBAN_PROTOCOL_TXT
+                and data[8:HEADER_SIZE] == self._streamname
+            ):
+                self._request(data[HEADER_SIZE + 4 :])
+
+    def _reply_to(self, source: str) -> str:
+        """returns the host that RT packets for a registration from source are sent to"""
+        if self.reply_host is not None:
+            return self.reply_host
+        if ipaddress.ip_address(source).is_loopback:
+            try:
+                return socket.gethostbyname(socket.gethostname())
+            except OSError as e:
+                self.logger.debug(f"{type(e).__name__}: {e}")
+        return source
+
+    def _request(self, payload: bytes):
+        """applies the commands of a request packet to the model"""
+        self.requests += 1
+        with self._lock:
+            for cmd in re.split(r"[;\n]", payload.decode(errors="replace")):
+                cmd, sep, val = cmd.strip().partition("=")
+                if not sep:
+                    continue
+                self.commands += 1
+                try:
+                    self._changed |= self.model.apply(cmd.strip(), val.strip())
+                except ValueError as e:
+                    self.logger.debug(f"invalid command {cmd}={val}: {e}")
+
+    def _synth_levels(self, now: float):
+        """writes a slow sine sweep into each level channel, channels of muted strips/buses are silent"""
+        t = 2 * math.pi * 0.5 * (now - self._start)
+        for name, channels, states in (
+            ("inputLeveldB100", self._strip_channels, self.model.stripstate),
+            ("outputLeveldB100", self._bus_channels, self.model.busstate),
+        ):
+            struct.Struct(f"<{len(channels)}H").pack_into(
+                self._packet,
+                RT_LAYOUT[name][0],
+                *(
+                    0
+                    if states[channel] & Modes._mute
+                    else _word(-40 + 30 * math.sin(t + i))
+                    for i, channel in enumerate(channels)
+                ),
+            )
+
+    def _stream(self, now: float):
+        """sends an RT packet to each registered host"""
+        for host, expiry in tuple(self.subscribers.items()):
+            if expiry < now:
+                del self.subscribers[host]
+                self.logger.info(f"{host} registration timed out")
+        if not self.subscribers:
+            return
+        with self._lock:
+            if self._changed:
+                self.model.pack_into(self._packet)
+                self._changed = False
+            if self.levels:
+                self._synth_levels(now)
+        FRAMECOUNTER.pack_into(self._packet, HEADER_SIZE, self.sent & 0xFFFFFFFF)
+        for host in self.subscribers:
+            try:
+                self.sock.sendto(self._packet, (host, self.port))
+            except OSError as e:
+                self.logger.debug(f"{type(e).__name__}: {e}")
+        self.sent += 1
+
+    def run(self):
+        period = 1 / self.rate
+        deadline = time.monotonic()
+        with selectors.DefaultSelector() as sel:
+            sel.register(self.sock, selectors.EVENT_READ)
+            while not self._stop_event.is_set():
+                if (now := time.monotonic()) >= deadline:
+                    self._stream(now)
+                    # fall behind rather than burst after a stall
+                    deadline = max(deadline + period, now)
+                if sel.select(min(max(deadline - time.monotonic(), 0), 0.1)):
+                    self._receive()
+        self.logger.debug(f"terminating {self.name} thread")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Emulates the Voicemeeter RT packet service"
+    )
+    parser.add_argument("kind", choices=[kind.name.lower() for kind in KindId])
+    parser.add_argument("--host", default="127.0.0.2")
+    parser.add_argument("--port", type=int, default=6980)
+    parser.add_argument("--streamname", default="Command1")
+    parser.add_argument("--rate", type=float, default=50, help="packets per second")
+    parser.add_argument(
+        "--reply-host",
+        help="host RT packets are sent to, by default the registering host (this host's address for local clients)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with Emulator(
+        args.kind,
+        args.host,
+        args.port,
+        args.streamname,
+        args.rate,
+        reply_host=args.reply_host,
+    ) as emulator:
+        try:
+            emulator.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from enum import IntEnum
 from functools import cached_property
 from typing import Iterable
 
+from .asyncvbancmd import AsyncVbanCmd
 from .bus import request_bus_obj as bus
 from .command import Command
 from .config import request_config as configs
@@ -82,13 +83,31 @@ class FactoryBase(VbanCmd):
             "port": 6980,
             "streamname": "Command1",
             "bps": 0,
+            "pace": False,
+            "pps": None,
             "channel": 0,
             "ratelimit": 0.01,
+            "latest": False,
+            "rcvbuf": None,
+            "recv_buffers": 0,
             "timeout": 5,
+            "dns_ttl": 300,
+            "combine": False,
+            "flush_interval": 0.01,
+            "deadlines": None,
             "outbound": False,
             "sync": False,
             "pdirty": False,
             "ldirty": False,
+            "level_backend": "array",
+            "meter": None,
+            "history": 0,
+            "capture": None,
+            "fields": None,
+            "engine": "threads",
+            "overflow": "coalesce",
+            "dispatch": "inline",
+            "max_workers": None,
         }
         if "subs" in kwargs:
             defaultkwargs |= kwargs.pop("subs")  # for backwards compatibility
@@ -191,12 +210,8 @@ class PotatoFactory(FactoryBase):
         return self._steps
 
 
-def vbancmd_factory(kind_id: str, **kwargs) -> VbanCmd:
-    """
-    Factory method, invokes a factory creation class of a kind
-
-    Returns a VbanCmd class of a kind
-    """
+def kind_factory(kind_id: str):
+    """Returns the factory creation class of a kind"""
     match kind_id:
         case "basic":
             _factory = BasicFactory
@@ -206,9 +221,31 @@ def vbancmd_factory(kind_id: str, **kwargs) -> VbanCmd:
             _factory = PotatoFactory
         case _:
             raise ValueError(f"Unknown Voicemeeter kind '{kind_id}'")
+    return _factory
+
+
+def vbancmd_factory(kind_id: str, **kwargs) -> VbanCmd:
+    """
+    Factory method, invokes a factory creation class of a kind
+
+    Returns a VbanCmd class of a kind
+    """
+    _factory = kind_factory(kind_id)
     return type(f"VbanCmd{kind_id.capitalize()}", (_factory,), {})(kind_id, **kwargs)
 
 
+def async_vbancmd_factory(kind_id: str, **kwargs) -> AsyncVbanCmd:
+    """
+    Factory method, invokes a factory creation class of a kind
+
+    Returns an AsyncVbanCmd class of a kind
+    """
+    _factory = kind_factory(kind_id)
+    return type(f"AsyncVbanCmd{kind_id.capitalize()}", (AsyncVbanCmd, _factory), {})(
+        kind_id, **kwargs
+    )
+
+
 def request_vbancmd_obj(kind_id: str, **kwargs) -> VbanCmd:
     """
     Interface entry point. Wraps factory method and handles errors
@@ -224,3 +261,20 @@ def request_vbancmd_obj(kind_id: str, **kwargs) -> VbanCmd:
         logger_entry.exception(f"{type(e).__name__}: {e}")
         raise VBANCMDError(str(e)) from e
     return VBANCMD_obj
+
+
+def request_async_vbancmd_obj(kind_id: str, **kwargs) -> AsyncVbanCmd:
+    """
+    Asyncio interface entry point. Wraps factory method and handles errors
+
+    Returns a reference to an AsyncVbanCmd class of a kind
+    """
+    logger_entry = logger.getChild("factory.request_async_vbancmd_obj")
+
+    VBANCMD_obj = None
+    try:
+        VBANCMD_obj = async_vbancmd_factory(kind_id, **kwargs)
+    except (ValueError, TypeError) as e:
+        logger_entry.exception(f"{type(e).__name__}: {e}")
+        raise VBANCMDError(str(e)) from e
+    return VBANCMD_obj
@@ -0,0 +1,110 @@
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+from .levels import NumpyLevels
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+
+class LevelHistory:
+    """
+    Fixed size ring buffer of level frames
+
+    A frame is the raw level words (uint16) of all strip then bus level channels, stored with a monotonic timestamp.
+    Each frame is written twice (a mirrored ring), so the latest capacity frames are always contiguous
+    and queries return views rather than copies.
+
+    Views are live, a frame is overwritten capacity frames later. Copy what you need to keep.
+    """
+
+    def __init__(self, kind, capacity: int, levels):
+        self.capacity = capacity
+        self.strips = slice(0, kind.num_strip_levels)
+        self.buses = slice(
+            kind.num_strip_levels, kind.num_strip_levels + kind.num_bus_levels
+        )
+        self.width = self.buses.stop
+        self._numpy = isinstance(levels, NumpyLevels)
+        if self._numpy:
+            self._frames = np.zeros((2 * capacity, self.width), dtype=np.uint16)
+            self._stamps = np.zeros(2 * capacity)
+        else:
+            self._frames = array("H", bytes(4 * capacity * self.width))
+            self._stamps = array("d", bytes(16 * capacity))
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def append(self, strip_levels, bus_levels, now: float = None):
+        """stores a frame, overwriting the oldest once the buffer is full"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            slot = self._count % self.capacity
+            for row in (slot, slot + self.capacity):
+                self._stamps[row] = now
+                if self._numpy:
+                    self._frames[row, self.strips] = strip_levels
+                    self._frames[row, self.buses] = bus_levels
+                else:
+                    start = row * self.width
+                    self._frames[
+                        start + self.strips.start : start + self.strips.stop
+                    ] = strip_levels
+                    self._frames[
+                        start + self.buses.start : start + self.buses.stop
+                    ] = bus_levels
+            self._count += 1
+
+    def _rows(self, t: float) -> tuple:
+        """returns the physical rows [start, stop) of the frames stamped after t"""
+        stop = (self._count - 1) % self.capacity + self.capacity + 1
+        start = stop - len(self)
+        if self._numpy:
+            start += int(np.searchsorted(self._stamps[start:stop], t, side="right"))
+        else:
+            start = bisect_right(self._stamps, t, start, stop)
+        return start, stop
+
+    def levels_since(self, t: float) -> tuple:
+        """
+        Returns (timestamps, frames) of the frames stamped after t, oldest first.
+
+        frames is a 2-D view, one row per frame.
+        """
+        with self._lock:
+            start, stop = self._rows(t)
+            if self._numpy:
+                return self._stamps[start:stop], self._frames[start:stop]
+            frames = memoryview(self._frames)[start * self.width : stop * self.width]
+            # a memoryview can't take a shape with a zero in it
+            return (
+                memoryview(self._stamps)[start:stop],
+                frames.cast("B").cast("H", (stop - start, self.width))
+                if start < stop
+                else frames,
+            )
+
+    def window(self, channel: int, seconds: float) -> tuple:
+        """
+        Returns (timestamps, values) of one channel over the last seconds, oldest first.
+
+        channel indexes a frame, see strips and buses.
+        """
+        with self._lock:
+            start, stop = self._rows(time.monotonic() - seconds)
+            if self._numpy:
+                return self._stamps[start:stop], self._frames[start:stop, channel]
+            return (
+                memoryview(self._stamps)[start:stop],
+                memoryview(self._frames)[
+                    start * self.width + channel : stop * self.width : self.width
+                ],
+            )
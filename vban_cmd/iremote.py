@@ -1,5 +1,4 @@
 import logging
-import time
 from abc import ABCMeta, abstractmethod
 from dataclasses import dataclass
 
@@ -102,7 +101,7 @@ class IRemote(metaclass=ABCMeta):
     def setter(self, param, val):
         """Sends a string request RT packet."""
         self.logger.debug(f"setter: {self._cmd(param)}={val}")
-        self._remote._set_rt(self._cmd(param), val)
+        return self._remote._set_rt(self._cmd(param), val)
 
     def _cmd(self, param):
         cmd = (self.identifier,)
@@ -120,8 +119,8 @@ class IRemote(metaclass=ABCMeta):
         """Returns an RT data packet."""
         return self._remote.public_packet
 
-    def apply(self, data):
-        """Sets all parameters of a dict for the channel."""
+    def _script(self, data) -> str:
+        """Returns the script that sets all parameters of a dict for the channel."""
 
         def fget(attr, val):
             if attr == "mode":
@@ -130,6 +129,7 @@ class IRemote(metaclass=ABCMeta):
                 return ("", val)
             return (attr, val)
 
+        script = str()
         for attr, val in data.items():
             if not isinstance(val, dict):
                 if attr in dir(self):  # avoid calling getattr (with hasattr)
@@ -138,14 +138,16 @@ class IRemote(metaclass=ABCMeta):
                         val = 1 if val else 0
 
                     self._remote.cache[self._cmd(attr)] = val
-                    self._remote._script += f"{self._cmd(attr)}={val};"
+                    script += f"{self._cmd(attr)}={val};"
             else:
                 target = getattr(self, attr)
-                target.apply(val)
+                script += target._script(val)
+        return script
 
-        self._remote.sendtext(self._remote._script)
+    def apply(self, data):
+        """Sets all parameters of a dict for the channel."""
+        self._remote.sendtext(self._script(data))
         return self
 
     def then_wait(self):
-        self._remote._script = str()
-        time.sleep(self._remote.DELAY)
+        self._remote._delay()
@@ -0,0 +1,95 @@
+import sys
+from array import array
+from functools import cache
+
+from .error import VBANCMDError
+from .util import comp
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+
+@cache
+def db_table() -> array:
+    """lookup table of dB values, indexed by raw level word"""
+    return array("d", (round((((1 << 16) - 1) - i) * -0.01, 1) for i in range(1 << 16)))
+
+
+class ArrayLevels:
+    """
+    Level backend built on the array module
+
+    Level words are decoded into an array('H'), dB values are returned as tuples.
+    """
+
+    name = "array"
+
+    def decode(self, buf, offset: int, count: int) -> array:
+        levels = array("H")
+        levels.frombytes(buf[offset : offset + 2 * count])
+        if sys.byteorder == "big":
+            levels.byteswap()
+        return levels
+
+    def todb(self, levels) -> tuple:
+        return tuple(map(db_table().__getitem__, levels))
+
+    def changed(self, cache, levels) -> tuple:
+        return tuple(not val for val in comp(cache, levels))
+
+
+class NumpyLevels:
+    """
+    Level backend built on numpy
+
+    Level words are a uint16 view of the packet buffer (a copy if the buffer is mutable), dB values are returned as float arrays.
+    """
+
+    name = "numpy"
+
+    def __init__(self):
+        self._table = np.frombuffer(db_table(), dtype=np.float64)
+
+    def decode(self, buf, offset: int, count: int):
+        levels = np.frombuffer(buf, dtype="<u2", count=count, offset=offset)
+        # never keep a view of a buffer that may be reused (a pooled receive buffer)
+        return levels if buf.readonly else levels.copy()
+
+    def todb(self, levels):
+        return self._table[levels]
+
+    def changed(self, cache, levels):
+        return (cache != levels) & (((1 << 16) - 1) - levels <= 7200)
+
+
+def level_backend_factory(name: str):
+    match name:
+        case "array":
+            _backend = ArrayLevels
+        case "numpy":
+            if np is None:
+                raise ValueError(
+                    "level backend 'numpy' requires numpy, pip install vban-cmd[numpy]"
+                )
+            _backend = NumpyLevels
+        case _:
+            raise ValueError(f"Unknown level backend '{name}'")
+    return _backend()
+
+
+def request_level_backend(name: str):
+    """
+    Level backend entry point.
+
+    Returns an object that decodes level words and converts them to dB
+    """
+    try:
+        backend = level_backend_factory(name)
+    except ValueError as e:
+        raise VBANCMDError(str(e)) from e
+    return backend
+
+
+array_levels = ArrayLevels()
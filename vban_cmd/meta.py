@@ -11,13 +11,10 @@ def channel_bool_prop(param):
         cmd = self._cmd(param)
         self.logger.debug(f"getter: {cmd}")
         return (
-            not int.from_bytes(
-                getattr(
-                    self.public_packet,
-                    f"{'strip' if 'strip' in type(self).__name__.lower() else 'bus'}state",
-                )[self.index],
-                "little",
-            )
+            not getattr(
+                self.public_packet,
+                f"{'strip' if 'strip' in type(self).__name__.lower() else 'bus'}state",
+            )[self.index]
             & getattr(self._modes, f"_{param.lower()}")
             == 0
         )
@@ -52,7 +49,7 @@ def strip_output_prop(param):
         cmd = self._cmd(param)
         self.logger.debug(f"getter: {cmd}")
         return (
-            not int.from_bytes(self.public_packet.stripstate[self.index], "little")
+            not self.public_packet.stripstate[self.index]
             & getattr(self._modes, f"_bus{param.lower()}")
             == 0
         )
@@ -84,7 +81,7 @@ def bus_mode_prop(param):
             "rearonly": (1, 2, 3, 0, 1, 2, 3, 8, 9, 10, 11),
         }
         vals = (
-            int.from_bytes(self.public_packet.busstate[self.index], "little") & val
+            self.public_packet.busstate[self.index] & val
             for val in self._modes.modevals
         )
         if param == "normal":
@@ -0,0 +1,202 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+from itertools import chain
+from typing import Sequence
+
+from .error import VBANCMDError
+from .levels import NumpyLevels
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+
+@dataclass(frozen=True)
+class MeterValues:
+    """Ready to draw meter values (dB) for a group of level channels"""
+
+    level: Sequence[float]
+    peak: Sequence[float]
+    clip: Sequence[bool]
+
+
+class Ballistics:
+    """Smoothed level, peak hold and clip flags for a group of channels, in plain Python"""
+
+    def __init__(self, num: int, floor: float):
+        self.level = [floor] * num
+        self.peak = [floor] * num
+        self.held = [0.0] * num
+        self.clip = [False] * num
+
+    def advance(self, x, now: float, dt: float, meter):
+        a_att, a_rel = meter._coefficients(dt)
+        floor, hold, decay, clip = meter.floor, meter.hold, meter.decay, meter.clip
+        # whole arrays a step at a time, comprehensions rather than indexed updates
+        x = [xi if xi > floor else floor for xi in x]
+        self.level = [
+            lvl + (xi - lvl) * (a_att if xi > lvl else a_rel)
+            for xi, lvl in zip(x, self.level)
+        ]
+        rising = [xi >= pk for xi, pk in zip(x, self.peak)]
+        self.held = [now if r else held for r, held in zip(rising, self.held)]
+        self.peak = [
+            xi
+            if r
+            else (
+                pk
+                if (over := now - held - hold) <= 0
+                else max(xi, pk - decay * min(dt, over))
+            )
+            for xi, pk, held, r in zip(x, self.peak, self.held, rising)
+        ]
+        self.clip = [c or xi >= clip for xi, c in zip(x, self.clip)]
+
+    @staticmethod
+    def join(*groups) -> tuple:
+        return tuple(chain(*groups))
+
+    def values(self, group: slice) -> MeterValues:
+        return MeterValues(
+            tuple(self.level[group]), tuple(self.peak[group]), tuple(self.clip[group])
+        )
+
+    def reset_clip(self):
+        self.clip = [False] * len(self.clip)
+
+
+class NumpyBallistics:
+    """Smoothed level, peak hold and clip flags for a group of channels, vectorized with numpy"""
+
+    def __init__(self, num: int, floor: float):
+        self.level = np.full(num, floor)
+        self.peak = np.full(num, floor)
+        self.held = np.zeros(num)
+        self.clip = np.zeros(num, dtype=bool)
+        self._x = np.empty(num)
+        self._over = np.empty(num)
+        self._rising = np.empty(num, dtype=bool)
+
+    def advance(self, x, now: float, dt: float, meter):
+        a_att, a_rel = meter._coefficients(dt)
+        # in place into preallocated arrays, a packet's worth of channels is small enough for call overhead to dominate
+        x = np.maximum(x, meter.floor, out=self._x)
+        rising = np.greater_equal(x, self.level, out=self._rising)
+        self.level += (x - self.level) * np.where(rising, a_att, a_rel)
+        rising = np.greater_equal(x, self.peak, out=self._rising)
+        np.copyto(self.held, now, where=rising)
+        over = np.subtract(now - meter.hold, self.held, out=self._over)
+        np.minimum(np.maximum(over, 0.0, out=over), dt, out=over)
+        self.peak -= meter.decay * over
+        np.maximum(self.peak, x, out=self.peak)
+        np.logical_or(self.clip, x >= meter.clip, out=self.clip)
+
+    @staticmethod
+    def join(*groups):
+        return np.concatenate(groups)
+
+    def values(self, group: slice) -> MeterValues:
+        return MeterValues(
+            self.level[group].copy(), self.peak[group].copy(), self.clip[group].copy()
+        )
+
+    def reset_clip(self):
+        self.clip[:] = False
+
+
+class Meter:
+    """
+    Metering engine for all strip and bus level channels
+
+    Updated from the dB levels of each RT packet, whole arrays at a time.
+    Between packets the last levels are held, so release and peak decay continue until read.
+
+    attack, release: ballistics time constants (seconds).
+    hold: time (seconds) a peak is held before it decays at decay (dB per second).
+    clip: level (dB) at or above which a channel's clip flag latches until reset_clip().
+    floor: levels (dB) are clamped to floor.
+    """
+
+    def __init__(
+        self,
+        kind,
+        levels,
+        attack: float = 0.01,
+        release: float = 0.3,
+        hold: float = 1.0,
+        decay: float = 20.0,
+        clip: float = 0.0,
+        floor: float = -72.0,
+    ):
+        self.attack = attack
+        self.release = release
+        self.hold = hold
+        self.decay = decay
+        self.clip = clip
+        self.floor = floor
+        _ballistics = NumpyBallistics if isinstance(levels, NumpyLevels) else Ballistics
+        # one group over strip and bus channels, advanced a step per packet
+        self._channels = _ballistics(kind.num_strip_levels + kind.num_bus_levels, floor)
+        self._strips = slice(0, kind.num_strip_levels)
+        self._buses = slice(kind.num_strip_levels, None)
+        self._x = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _coefficients(self, dt: float) -> tuple:
+        """returns the attack and release smoothing coefficients for a step of dt seconds"""
+        return tuple(
+            1.0 if tau <= 0 else 1.0 - math.exp(-dt / tau)
+            for tau in (self.attack, self.release)
+        )
+
+    def _advance(self, now: float):
+        if self._x is None:
+            return
+        self._channels.advance(self._x, now, now - self._stamp, self)
+        self._stamp = now
+
+    def update(self, strip_db, bus_db, now: float = None):
+        """advances the meters to now on new dB levels, strip_db and bus_db as returned by a packet"""
+        if now is None:
+            now = time.monotonic()
+        x = self._channels.join(strip_db, bus_db)
+        with self._lock:
+            dt = 0.0 if self._stamp is None else now - self._stamp
+            self._channels.advance(x, now, dt, self)
+            self._x, self._stamp = x, now
+
+    def values(self, now: float = None) -> tuple:
+        """
+        Returns ready to draw MeterValues for (strips, buses)
+
+        The meters are advanced to now first.
+        """
+        with self._lock:
+            self._advance(time.monotonic() if now is None else now)
+            return (
+                self._channels.values(self._strips),
+                self._channels.values(self._buses),
+            )
+
+    def reset_clip(self):
+        """clears the clip flags of all channels"""
+        with self._lock:
+            self._channels.reset_clip()
+
+
+def request_meter(kind, levels, opts):
+    """
+    Meter entry point.
+
+    opts may be True for the defaults or a dict of Meter kwargs, returns None if falsy.
+    """
+    if not opts:
+        return
+    try:
+        return Meter(kind, levels, **({} if opts is True else opts))
+    except TypeError as e:
+        raise VBANCMDError(f"Invalid meter options: {e}") from e
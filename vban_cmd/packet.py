@@ -1,7 +1,9 @@
+import struct
 from dataclasses import dataclass
+from functools import cache, cached_property
 
 from .kinds import KindMapClass
-from .util import comp
+from .levels import array_levels
 
 VBAN_PROTOCOL_TXT = 0x40
 VBAN_PROTOCOL_SERVICE = 0x60
@@ -11,207 +13,336 @@ VBAN_SERVICE_RTPACKET = 33
 
 MAX_PACKET_SIZE = 1436
 HEADER_SIZE = 4 + 1 + 1 + 1 + 1 + 16
+FRAMECOUNTER = struct.Struct("<I")
+
+
+def _rt_layout(*fields) -> dict:
+    """precompiles a struct.Struct for each field of an RT data packet, keyed by name"""
+    layout, offset = {}, HEADER_SIZE + 4
+    for name, fmt in fields:
+        layout[name] = (offset, struct.Struct(f"<{fmt}"))
+        offset += layout[name][1].size
+    return layout
+
+
+RT_LAYOUT = _rt_layout(
+    ("voicemeeterType", "B"),
+    ("reserved", "B"),
+    ("buffersize", "H"),
+    ("voicemeeterVersion", "4B"),
+    ("optionBits", "I"),
+    ("samplerate", "I"),
+    ("inputLeveldB100", "34H"),
+    ("outputLeveldB100", "64H"),
+    ("TransportBit", "I"),
+    ("stripState", "8I"),
+    ("busState", "8I"),
+    ("stripGaindB100Layer", "64H"),  # 8 layers of 8 strips
+    ("busGaindB100", "8H"),
+    ("stripLabelUTF8c60", "60s" * 8),
+    ("busLabelUTF8c60", "60s" * 8),
+)
+RT_PACKET_SIZE = sum(fmt.size for _, fmt in RT_LAYOUT.values()) + HEADER_SIZE + 4
+RT_BODY = slice(HEADER_SIZE + 4, RT_PACKET_SIZE)
+PARAMS = slice(RT_LAYOUT["stripState"][0], RT_PACKET_SIZE)
+
+# fields of an RT packet a consumer may project onto
+RT_FIELDS = {
+    "levels": ("inputLeveldB100", "outputLeveldB100"),
+    "stripstate": ("stripState",),
+    "busstate": ("busState",),
+    "stripgainlayers": ("stripGaindB100Layer",),
+    "busgain": ("busGaindB100",),
+    "striplabels": ("stripLabelUTF8c60",),
+    "buslabels": ("busLabelUTF8c60",),
+}
+
+
+PARAM_FIELDS = frozenset(RT_FIELDS) - {"levels"}
+
+
+@cache
+def rt_slices(fields: frozenset) -> tuple:
+    """returns the fewest slices of an RT packet that cover the given fields"""
+    ranges = sorted(
+        (RT_LAYOUT[name][0], RT_LAYOUT[name][0] + RT_LAYOUT[name][1].size)
+        for field in fields
+        for name in RT_FIELDS[field]
+    )
+    merged = []
+    for start, stop in ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1][1] = stop
+        else:
+            merged.append([start, stop])
+    return tuple(slice(start, stop) for start, stop in merged)
+
+
+def _bitmap(t0: tuple, t1: tuple) -> int:
+    """returns an int with bit i set iff t0[i] != t1[i]"""
+    return sum(1 << i for i, (a, b) in enumerate(zip(t0, t1)) if a != b)
+
+
+@dataclass(frozen=True)
+class ParamDiff:
+    """
+    Bitmaps of the parameters that changed between two RT packets
+
+    Bit i of each bitmap is set iff channel i changed.
+    For stripgainlayers bit (8 * layer + i) is set iff strip i changed in that layer.
+    """
+
+    stripstate: int = 0
+    busstate: int = 0
+    stripgainlayers: int = 0
+    busgain: int = 0
+    striplabels: int = 0
+    buslabels: int = 0
+
+    def __bool__(self) -> bool:
+        return any(
+            (
+                self.stripstate,
+                self.busstate,
+                self.stripgainlayers,
+                self.busgain,
+                self.striplabels,
+                self.buslabels,
+            )
+        )
+
+    def __or__(self, other):
+        return ParamDiff(
+            self.stripstate | other.stripstate,
+            self.busstate | other.busstate,
+            self.stripgainlayers | other.stripgainlayers,
+            self.busgain | other.busgain,
+            self.striplabels | other.striplabels,
+            self.buslabels | other.buslabels,
+        )
+
+    def gainlayer(self, layer: int) -> int:
+        """returns a bitmap of the strips that changed in a gainlayer"""
+        return (self.stripgainlayers >> (8 * layer)) & 0xFF
+
+    @property
+    def strips(self) -> int:
+        """returns a bitmap of the strips with any changed parameter"""
+        strips = self.stripstate | self.striplabels
+        for layer in range(8):
+            strips |= self.gainlayer(layer)
+        return strips
+
+    @property
+    def buses(self) -> int:
+        """returns a bitmap of the buses with any changed parameter"""
+        return self.busstate | self.busgain | self.buslabels
+
+    def strip(self, index: int) -> bool:
+        """True iff any parameter of strip[index] has changed"""
+        return bool(self.strips >> index & 1)
+
+    def bus(self, index: int) -> bool:
+        """True iff any parameter of bus[index] has changed"""
+        return bool(self.buses >> index & 1)
 
 
 @dataclass
 class VbanRtPacket:
-    """Represents the body of a VBAN RT data packet"""
+    """
+    Represents the body of a VBAN RT data packet
+
+    Fields are decoded on first access straight from the packet buffer,
+    then memoized for the lifetime of the packet.
+    """
 
     _kind: KindMapClass
-    _voicemeeterType: bytes  # data[28:29]
-    _reserved: bytes  # data[29:30]
-    _buffersize: bytes  # data[30:32]
-    _voicemeeterVersion: bytes  # data[32:36]
-    _optionBits: bytes  # data[36:40]
-    _samplerate: bytes  # data[40:44]
-    _inputLeveldB100: bytes  # data[44:112]
-    _outputLeveldB100: bytes  # data[112:240]
-    _TransportBit: bytes  # data[240:244]
-    _stripState: bytes  # data[244:276]
-    _busState: bytes  # data[276:308]
-    _stripGaindB100Layer1: bytes  # data[308:324]
-    _stripGaindB100Layer2: bytes  # data[324:340]
-    _stripGaindB100Layer3: bytes  # data[340:356]
-    _stripGaindB100Layer4: bytes  # data[356:372]
-    _stripGaindB100Layer5: bytes  # data[372:388]
-    _stripGaindB100Layer6: bytes  # data[388:404]
-    _stripGaindB100Layer7: bytes  # data[404:420]
-    _stripGaindB100Layer8: bytes  # data[420:436]
-    _busGaindB100: bytes  # data[436:452]
-    _stripLabelUTF8c60: bytes  # data[452:932]
-    _busLabelUTF8c60: bytes  # data[932:1412]
-
-    def _generate_levels(self, levelarray) -> tuple:
-        return tuple(
-            int.from_bytes(levelarray[i : i + 2], "little")
-            for i in range(0, len(levelarray), 2)
-        )
+    _data: memoryview  # of a whole packet buffer (bytes or bytearray), header included
+    _levels: object = array_levels
 
-    @property
+    def _unpack(self, name: str) -> tuple:
+        offset, fmt = RT_LAYOUT[name]
+        return fmt.unpack_from(self._data, offset)
+
+    def _decode_levels(self, name: str):
+        offset, fmt = RT_LAYOUT[name]
+        return self._levels.decode(self._data, offset, fmt.size // 2)
+
+    @cached_property
     def strip_levels(self):
-        return self._generate_levels(self._inputLeveldB100)
+        return self._decode_levels("inputLeveldB100")
 
-    @property
+    @cached_property
     def bus_levels(self):
-        return self._generate_levels(self._outputLeveldB100)
-
-    def pdirty(self, other) -> bool:
-        """True iff any defined parameter has changed"""
-
-        return not (
-            self._stripState == other._stripState
-            and self._busState == other._busState
-            and self._stripGaindB100Layer1 == other._stripGaindB100Layer1
-            and self._stripGaindB100Layer2 == other._stripGaindB100Layer2
-            and self._stripGaindB100Layer3 == other._stripGaindB100Layer3
-            and self._stripGaindB100Layer4 == other._stripGaindB100Layer4
-            and self._stripGaindB100Layer5 == other._stripGaindB100Layer5
-            and self._stripGaindB100Layer6 == other._stripGaindB100Layer6
-            and self._stripGaindB100Layer7 == other._stripGaindB100Layer7
-            and self._stripGaindB100Layer8 == other._stripGaindB100Layer8
-            and self._busGaindB100 == other._busGaindB100
-            and self._stripLabelUTF8c60 == other._stripLabelUTF8c60
-            and self._busLabelUTF8c60 == other._busLabelUTF8c60
+        return self._decode_levels("outputLeveldB100")
+
+    def pdirty(self, other, params: tuple = (PARAMS,)) -> bool:
+        """True iff any defined parameter has changed within the slices params"""
+
+        # memcmp of each slice against the other packet's buffer, like the fast path of PacketHandler.handle()
+        data = self._data.obj
+        for s in params:
+            if not data.startswith(other._data[s], s.start):
+                return True
+        return False
+
+    def pdiff(self, other, fields: frozenset = PARAM_FIELDS) -> ParamDiff:
+        """returns a ParamDiff of the parameters that changed within fields"""
+
+        if not self.pdirty(other, rt_slices(fields)):
+            return ParamDiff()
+        return ParamDiff(
+            **{
+                field: _bitmap(
+                    self._unpack(RT_FIELDS[field][0]),
+                    other._unpack(RT_FIELDS[field][0]),
+                )
+                for field in fields
+            }
         )
 
     def ldirty(self, strip_cache, bus_cache) -> bool:
         self._strip_comp, self._bus_comp = (
-            tuple(not val for val in comp(strip_cache, self.strip_levels)),
-            tuple(not val for val in comp(bus_cache, self.bus_levels)),
+            self._levels.changed(strip_cache, self.inputlevels),
+            self._levels.changed(bus_cache, self.outputlevels),
         )
         return any(any(l) for l in (self._strip_comp, self._bus_comp))
 
-    @property
+    @cached_property
     def voicemeetertype(self) -> str:
         """returns voicemeeter type as a string"""
         type_ = ("basic", "banana", "potato")
-        return type_[int.from_bytes(self._voicemeeterType, "little") - 1]
+        return type_[self._unpack("voicemeeterType")[0] - 1]
 
-    @property
+    @cached_property
     def voicemeeterversion(self) -> tuple:
         """returns voicemeeter version as a tuple"""
-        return tuple(
-            reversed(
-                tuple(
-                    int.from_bytes(self._voicemeeterVersion[i : i + 1], "little")
-                    for i in range(4)
-                )
-            )
-        )
+        return tuple(reversed(self._unpack("voicemeeterVersion")))
 
-    @property
+    @cached_property
     def samplerate(self) -> int:
         """returns samplerate as an int"""
-        return int.from_bytes(self._samplerate, "little")
+        return self._unpack("samplerate")[0]
 
-    @property
-    def inputlevels(self) -> tuple:
+    @cached_property
+    def inputlevels(self):
         """returns the entire level array across all inputs for a kind"""
         return self.strip_levels[0 : self._kind.num_strip_levels]
 
-    @property
-    def outputlevels(self) -> tuple:
+    @cached_property
+    def outputlevels(self):
         """returns the entire level array across all outputs for a kind"""
         return self.bus_levels[0 : self._kind.num_bus_levels]
 
-    @property
+    @cached_property
+    def inputlevels_db(self):
+        """returns the input level array for a kind, converted to dB"""
+        return self._levels.todb(self.inputlevels)
+
+    @cached_property
+    def outputlevels_db(self):
+        """returns the output level array for a kind, converted to dB"""
+        return self._levels.todb(self.outputlevels)
+
+    @cached_property
     def stripstate(self) -> tuple:
         """returns tuple of strip states accessable through bit modes"""
-        return tuple(self._stripState[i : i + 4] for i in range(0, 32, 4))
+        return self._unpack("stripState")
 
-    @property
+    @cached_property
     def busstate(self) -> tuple:
         """returns tuple of bus states accessable through bit modes"""
-        return tuple(self._busState[i : i + 4] for i in range(0, 32, 4))
+        return self._unpack("busState")
 
     """ 
     these functions return an array of gainlayers[i] across all strips 
     ie stripgainlayer1 = [strip[0].gainlayer[0], strip[1].gainlayer[0], strip[2].gainlayer[0]...]
     """
 
+    @cached_property
+    def stripgainlayers(self) -> tuple:
+        """returns a tuple of gainlayers, each a tuple of strip gains"""
+        gains = self._unpack("stripGaindB100Layer")
+        return tuple(gains[i : i + 8] for i in range(0, 64, 8))
+
     @property
     def stripgainlayer1(self) -> tuple:
-        return tuple(
-            int.from_bytes(self._stripGaindB100Layer1[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self.stripgainlayers[0]
 
     @property
     def stripgainlayer2(self) -> tuple:
-        return tuple(
-            int.from_bytes(self._stripGaindB100Layer2[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self.stripgainlayers[1]
 
     @property
     def stripgainlayer3(self) -> tuple:
-        return tuple(
-            int.from_bytes(self._stripGaindB100Layer3[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self.stripgainlayers[2]
 
     @property
     def stripgainlayer4(self) -> tuple:
-        return tuple(
-            int.from_bytes(self._stripGaindB100Layer4[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self.stripgainlayers[3]
 
     @property
     def stripgainlayer5(self) -> tuple:
-        return tuple(
-            int.from_bytes(self._stripGaindB100Layer5[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self.stripgainlayers[4]
 
     @property
     def stripgainlayer6(self) -> tuple:
-        return tuple(
-            int.from_bytes(self._stripGaindB100Layer6[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self.stripgainlayers[5]
 
     @property
     def stripgainlayer7(self) -> tuple:
-        return tuple(
-            int.from_bytes(self._stripGaindB100Layer7[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self.stripgainlayers[6]
 
     @property
     def stripgainlayer8(self) -> tuple:
-        return tuple(
-            int.from_bytes(self._stripGaindB100Layer8[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self.stripgainlayers[7]
 
-    @property
+    @cached_property
     def busgain(self) -> tuple:
         """returns tuple of bus gains"""
-        return tuple(
-            int.from_bytes(self._busGaindB100[i : i + 2], "little")
-            for i in range(0, 16, 2)
-        )
+        return self._unpack("busGaindB100")
 
-    @property
+    @cached_property
     def striplabels(self) -> tuple:
         """returns tuple of strip labels"""
         return tuple(
-            self._stripLabelUTF8c60[i : i + 60].decode().split("\x00")[0]
-            for i in range(0, 480, 60)
+            label.decode().split("\x00")[0]
+            for label in self._unpack("stripLabelUTF8c60")
         )
 
-    @property
+    @cached_property
     def buslabels(self) -> tuple:
         """returns tuple of bus labels"""
         return tuple(
-            self._busLabelUTF8c60[i : i + 60].decode().split("\x00")[0]
-            for i in range(0, 480, 60)
+            label.decode().split("\x00")[0] for label in self._unpack("busLabelUTF8c60")
         )
 
 
+class HeaderTemplate:
+    """
+    A header preallocated once as a bytearray
+
+    The framecounter is patched in place, no bytes are rebuilt per packet.
+    """
+
+    def _build(self, *fields: bytes, framecounter: bool = True):
+        header = b"".join(fields)
+        assert len(header) == HEADER_SIZE, f"expected header size {HEADER_SIZE} bytes"
+        self.header = bytearray(header + bytes(4)) if framecounter else header
+        self._framecounter = 0
+
+    @property
+    def framecounter(self) -> int:
+        return self._framecounter
+
+    @framecounter.setter
+    def framecounter(self, val: int):
+        self._framecounter = val & 0xFFFFFFFF
+        FRAMECOUNTER.pack_into(self.header, HEADER_SIZE, self._framecounter)
+
+
 @dataclass
-class SubscribeHeader:
+class SubscribeHeader(HeaderTemplate):
     """Represents the header an RT Packet Service subscription packet"""
 
     name = "Register RTP"
@@ -222,25 +353,20 @@ class SubscribeHeader:
     format_nbc: bytes = (VBAN_SERVICE_RTPACKETREGISTER).to_bytes(1, "little")
     format_bit: bytes = (timeout & 0x000000FF).to_bytes(1, "little")  # timeout
     streamname: bytes = name.encode("ascii") + bytes(16 - len(name))
-    framecounter: bytes = (0).to_bytes(4, "little")
 
-    @property
-    def header(self):
-        header = self.vban
-        header += self.format_sr
-        header += self.format_nbs
-        header += self.format_nbc
-        header += self.format_bit
-        header += self.streamname
-        header += self.framecounter
-        assert (
-            len(header) == HEADER_SIZE + 4
-        ), f"expected header size {HEADER_SIZE} bytes + 4 bytes framecounter ({HEADER_SIZE +4} bytes total)"
-        return header
+    def __post_init__(self):
+        self._build(
+            self.vban,
+            self.format_sr,
+            self.format_nbs,
+            self.format_nbc,
+            self.format_bit,
+            self.streamname,
+        )
 
 
 @dataclass
-class VbanRtPacketHeader:
+class VbanRtPacketHeader(HeaderTemplate):
     """Represents the header of a VBAN RT response packet"""
 
     name = "Voicemeeter-RTP"
@@ -251,20 +377,20 @@ class VbanRtPacketHeader:
     format_bit: bytes = (0).to_bytes(1, "little")
     streamname: bytes = name.encode("ascii") + bytes(16 - len(name))
 
-    @property
-    def header(self):
-        header = self.vban
-        header += self.format_sr
-        header += self.format_nbs
-        header += self.format_nbc
-        header += self.format_bit
-        header += self.streamname
-        assert len(header) == HEADER_SIZE, f"expected header size {HEADER_SIZE} bytes"
-        return header
+    def __post_init__(self):
+        self._build(
+            self.vban,
+            self.format_sr,
+            self.format_nbs,
+            self.format_nbc,
+            self.format_bit,
+            self.streamname,
+            framecounter=False,
+        )
 
 
 @dataclass
-class RequestHeader:
+class RequestHeader(HeaderTemplate):
     """Represents the header of a REQUEST RT PACKET"""
 
     name: str
@@ -273,7 +399,9 @@ class RequestHeader:
     vban: bytes = "VBAN".encode()
     nbs: bytes = (0).to_bytes(1, "little")
     bit: bytes = (0x10).to_bytes(1, "little")
-    framecounter: bytes = (0).to_bytes(4, "little")
+
+    def __post_init__(self):
+        self._build(self.vban, self.sr, self.nbs, self.nbc, self.bit, self.streamname)
 
     @property
     def sr(self):
@@ -286,17 +414,3 @@ class RequestHeader:
     @property
     def streamname(self):
         return self.name.encode() + bytes(16 - len(self.name))
-
-    @property
-    def header(self):
-        header = self.vban
-        header += self.sr
-        header += self.nbs
-        header += self.nbc
-        header += self.bit
-        header += self.streamname
-        header += self.framecounter
-        assert (
-            len(header) == HEADER_SIZE + 4
-        ), f"expected header size {HEADER_SIZE} bytes + 4 bytes framecounter ({HEADER_SIZE +4} bytes total)"
-        return header
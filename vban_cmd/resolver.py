@@ -0,0 +1,98 @@
+import logging
+import socket
+import threading
+import time
+
+from .error import VBANCMDConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class Resolver:
+    """
+    Resolves the remote host once and caches the address for ttl seconds.
+
+    Connects the given UDP sockets to the resolved address so sends skip per-call address handling.
+    """
+
+    def __init__(self, host: str, port: int, socks, ttl: float = 300):
+        self.host = host
+        self.port = port
+        self.socks = socks
+        self.ttl = ttl
+        self.logger = logger.getChild(self.__class__.__name__)
+        self._address = None
+        self._expires = 0
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._failures = 0
+        self._last = 0.0
+        self._total = 0.0
+        self._max = 0.0
+
+    def get(self) -> tuple:
+        """returns the cached address, resolving it if expired"""
+        if self.expired:
+            return self.resolve()
+        return self._address
+
+    @property
+    def expired(self) -> bool:
+        """True iff the cached address is missing or has outlived ttl"""
+        return self._address is None or time.monotonic() >= self._expires
+
+    def resolve(self) -> tuple:
+        """resolves the host and (re)connects the sockets if the address changed"""
+        with self._lock:
+            return self.update(self.lookup())
+
+    def lookup(self) -> str:
+        """
+        resolves the host without touching the sockets, returns its ip
+
+        If the lookup fails the cached ip is returned, if there is one.
+        """
+        start = time.perf_counter()
+        try:
+            ip = socket.gethostbyname(self.host)
+        except socket.gaierror as e:
+            self._failures += 1
+            if self._address is not None:
+                self.logger.warning(
+                    f"unable to resolve hostname {self.host}, keeping {self._address[0]}"
+                )
+                return self._address[0]
+            self.logger.exception(f"{type(e).__name__}: {e}")
+            raise VBANCMDConnectionError(
+                f"unable to resolve hostname {self.host}"
+            ) from e
+        finally:
+            self._lookups += 1
+            self._last = time.perf_counter() - start
+            self._total += self._last
+            self._max = max(self._max, self._last)
+        self.logger.debug(f"resolved {self.host} to {ip} in {self._last * 1000:.1f}ms")
+        return ip
+
+    def update(self, ip: str) -> tuple:
+        """(re)connects the sockets if the address changed, the address is cached for ttl seconds"""
+        if (address := (ip, self.port)) != self._address:
+            [sock.connect(address) for sock in self.socks]
+            self._address = address
+        self._expires = time.monotonic() + self.ttl
+        return self._address
+
+    def invalidate(self):
+        """forces the next lookup to resolve the host again"""
+        self._expires = 0
+
+    @property
+    def stats(self) -> dict:
+        """returns resolver timing (seconds) as a dict"""
+        return {
+            "lookups": self._lookups,
+            "failures": self._failures,
+            "last": self._last,
+            "total": self._total,
+            "max": self._max,
+        }
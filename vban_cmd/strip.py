@@ -1,4 +1,3 @@
-import time
 from abc import abstractmethod
 from typing import Union
 
@@ -43,11 +42,11 @@ class Strip(IRemote):
 
     def fadeto(self, target: float, time_: int):
         self.setter("FadeTo", f"({target}, {time_})")
-        time.sleep(self._remote.DELAY)
+        self._remote._delay()
 
     def fadeby(self, change: float, time_: int):
         self.setter("FadeBy", f"({change}, {time_})")
-        time.sleep(self._remote.DELAY)
+        self._remote._delay()
 
 
 class PhysicalStrip(Strip):
@@ -293,22 +292,9 @@ class StripLevel(IRemote):
     def getter(self):
         """Returns a tuple of level values for the channel."""
 
-        def fget(i):
-            return round((((1 << 16) - 1) - i) * -0.01, 1)
-
         if not self._remote.stopped() and self._remote.event.ldirty:
-            return tuple(
-                fget(i)
-                for i in self._remote.cache["strip_level"][
-                    self.range[0] : self.range[-1]
-                ]
-            )
-        return tuple(
-            fget(i)
-            for i in self._remote._get_levels(self.public_packet)[0][
-                self.range[0] : self.range[-1]
-            ]
-        )
+            return self._remote.cache["strip_level_db"][self.range[0] : self.range[-1]]
+        return self.public_packet.inputlevels_db[self.range[0] : self.range[-1]]
 
     @property
     def identifier(self) -> str:
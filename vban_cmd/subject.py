@@ -1,13 +1,53 @@
+import inspect
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .channel import EventChannel
+from .util import Histogram
 
 logger = logging.getLogger(__name__)
 
 
 class Subject:
-    def __init__(self):
-        """Adds support for observers and callbacks"""
+    MODES = ("inline", "worker", "pool")
+    EVENTS = ("pdirty", "ldirty")
+
+    def __init__(
+        self, mode: str = "inline", max_workers: int = None, timing: bool = False
+    ):
+        """
+        Adds support for observers and callbacks
+
+        mode decides where callbacks run:
+            inline: on the notifying thread.
+            worker: on a dedicated thread per observer.
+            pool: on a shared ThreadPoolExecutor.
+
+        Callbacks that require an argument are passed the pdiff of a notification,
+        so they needn't read vban.pdiff, which may hold a newer diff by the time a callback runs.
 
+        Exceptions raised by a callback are logged, they never reach the notifying thread.
+
+        Set timing to collect per observer callback timing, see stats. Off by default, it costs more than
+        a callback that does little.
+        """
+
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown dispatch mode '{mode}'")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.timing = timing
         self._observers = list()
+        self._index = {event: () for event in self.EVENTS}
+        self._workers = dict()
+        self._executor = None
+        self._queued = set()
+        self._again = dict()
+        self._stats = dict()
+        self._lock = threading.Lock()
         self.logger = logger.getChild(self.__class__.__name__)
 
     @property
@@ -16,15 +56,157 @@ class Subject:
 
         return self._observers
 
-    def notify(self, event):
+    @staticmethod
+    def _takes_pdiff(callback) -> bool:
+        """True iff a callback requires a positional argument"""
+
+        try:
+            params = inspect.signature(callback).parameters.values()
+        except (TypeError, ValueError):
+            return False
+        return any(
+            p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+            and p.default is p.empty
+            for p in params
+        )
+
+    def _callbacks(self, event) -> tuple:
+        """returns (observer, callback, takes pdiff) for an event, in the order observers were added"""
+
+        callbacks = (
+            (o, partial(o.on_update, event) if hasattr(o, "on_update") else o)
+            for o in self._observers
+            if hasattr(o, "on_update") or o.__name__ == f"on_{event}"
+        )
+        return tuple((o, fn, self._takes_pdiff(fn)) for o, fn in callbacks)
+
+    def _reindex(self):
+        """rebuilds the dispatch index of each event"""
+
+        # built up front and swapped in whole, a notifying thread never writes to the index or sees a partial one
+        self._index = {event: self._callbacks(event) for event in self.EVENTS}
+        for observer in set(self._workers) - set(self._observers):
+            self._workers.pop(observer).close()
+
+    def notify(self, event, pdiff=None):
         """run callbacks on update"""
 
-        for o in self._observers:
-            if hasattr(o, "on_update"):
-                o.on_update(event)
-            else:
-                if o.__name__ == f"on_{event}":
-                    o()
+        if (callbacks := self._index.get(event)) is None:
+            callbacks = self._callbacks(event)
+        match self.mode:
+            case "inline" if not self.timing:
+                for observer, callback, takes in callbacks:
+                    try:
+                        callback(pdiff) if takes else callback()
+                    except Exception as e:
+                        self.logger.exception(
+                            f"{observer} raised {type(e).__name__}: {e}"
+                        )
+            case "inline":
+                for observer, callback, takes in callbacks:
+                    self._call(observer, callback, (pdiff,) if takes else ())
+            case "worker":
+                for observer, callback, takes in callbacks:
+                    self._worker(observer).put(event, (callback, takes), pdiff)
+            case "pool":
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.max_workers, thread_name_prefix="observer"
+                    )
+                for observer, callback, takes in callbacks:
+                    # at most one call in flight per observer and event, a slow observer can't flood the pool
+                    key = (observer, event)
+                    with self._lock:
+                        if key in self._queued:
+                            # the rerun is passed the diffs of every notification it stands for
+                            prev = self._again.get(key)
+                            self._again[key] = (
+                                prev | pdiff
+                                if prev is not None and pdiff is not None
+                                else pdiff
+                            )
+                            continue
+                        self._queued.add(key)
+                    self._executor.submit(self._run, key, callback, takes, pdiff)
+
+    def _call(self, observer, callback, args: tuple = ()):
+        """runs a callback, logging any exception it raises, timing it if timing is set"""
+
+        if not self.timing:
+            try:
+                callback(*args)
+            except Exception as e:
+                self.logger.exception(f"{observer} raised {type(e).__name__}: {e}")
+            return
+        start = time.perf_counter()
+        try:
+            callback(*args)
+        except Exception as e:
+            failed = True
+            self.logger.exception(f"{observer} raised {type(e).__name__}: {e}")
+        else:
+            failed = False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self._stats.setdefault(observer, [0, 0, 0.0, 0.0, 0.0, Histogram()])
+            stats[0] += 1
+            stats[1] += failed
+            stats[2] = elapsed
+            stats[3] += elapsed
+            stats[4] = max(stats[4], elapsed)
+            stats[5].record(elapsed)
+
+    def _run(self, key, callback, takes: bool, pdiff):
+        """runs a pooled callback, once more if it was notified again meanwhile"""
+
+        while True:
+            self._call(key[0], callback, (pdiff,) if takes else ())
+            with self._lock:
+                if key not in self._again:
+                    self._queued.discard(key)
+                    return
+                pdiff = self._again.pop(key)
+
+    def _worker(self, observer) -> EventChannel:
+        """returns the event channel of an observer's worker thread, starting it if needed"""
+
+        if (channel := self._workers.get(observer)) is None:
+            channel = self._workers[observer] = EventChannel()
+
+            def run():
+                while item := channel.get():
+                    _, (callback, takes), pdiff = item
+                    self._call(observer, callback, (pdiff,) if takes else ())
+
+            threading.Thread(
+                target=run, name=f"observer {observer}", daemon=True
+            ).start()
+        return channel
+
+    @property
+    def stats(self) -> dict:
+        """returns callback timing (seconds) per observer if timing is set, latency is a Histogram snapshot"""
+
+        with self._lock:
+            return {
+                observer: dict(
+                    zip(
+                        ("calls", "errors", "last", "total", "max", "latency"),
+                        (*stats[:5], stats[5].snapshot()),
+                    )
+                )
+                for observer, stats in self._stats.items()
+            }
+
+    def shutdown(self):
+        """stops the worker threads and the executor, pending callbacks still run"""
+
+        for channel in self._workers.values():
+            channel.close()
+        self._workers.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
     def add(self, observer):
         """adds an observer to observers"""
@@ -44,6 +226,8 @@ class Subject:
             else:
                 self.logger.error(f"Failed to add {observer} to event observers")
 
+        self._reindex()
+
     register = add
 
     def remove(self, observer):
@@ -64,9 +248,12 @@ class Subject:
             except ValueError:
                 self.logger.error(f"Failed to remove {observer} from event observers")
 
+        self._reindex()
+
     deregister = remove
 
     def clear(self):
         """clears the observers list"""
 
         self._observers.clear()
+        self._reindex()
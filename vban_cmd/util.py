@@ -1,3 +1,7 @@
+import math
+import socket
+import time
+from collections import deque
 from enum import IntEnum
 from typing import Iterator
 
@@ -57,6 +61,29 @@ def script(func):
     return wrapper
 
 
+def split_script(script: bytes, size: int) -> list:
+    """
+    Splits a script at ; boundaries into the fewest chunks of at most size bytes.
+
+    A single command longer than size is returned as a chunk of its own.
+    """
+    if len(script) <= size:
+        return [script]
+
+    chunks, chunk, length = [], [], 0
+    for cmd in script.split(b";"):
+        if not cmd:
+            continue
+        if chunk and length + len(cmd) + 1 > size:
+            chunks.append(b"".join(chunk))
+            chunk, length = [], 0
+        chunk.append(cmd + b";")
+        length += len(cmd) + 1
+    if chunk:
+        chunks.append(b"".join(chunk))
+    return chunks
+
+
 def comp(t0: tuple, t1: tuple) -> Iterator[bool]:
     """
     Generator function, accepts two tuples.
@@ -85,4 +112,120 @@ def deep_merge(dict1, dict2):
             yield k, dict2[k]
 
 
+class TokenBucket:
+    """Token bucket refilled at rate tokens per second, holding at most capacity tokens"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._stamp = time.monotonic()
+
+    def take(self, n: float = 1) -> float:
+        """takes n tokens, returns the time (seconds) to wait until they are available"""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._stamp) * self.rate
+        )
+        self._stamp = now
+        self._tokens -= n
+        return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class BufferPool:
+    """
+    Preallocated receive buffers
+
+    Buffers are handed out in the order they were released, so a released buffer is reused as late as possible.
+    The pool grows if it runs dry.
+    """
+
+    def __init__(self, count: int, size: int):
+        self.size = size
+        self._free = deque(bytearray(size) for _ in range(count))
+        self.allocated = count
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def acquire(self) -> bytearray:
+        try:
+            return self._free.popleft()
+        except IndexError:
+            self.allocated += 1
+            return bytearray(self.size)
+
+    def release(self, buf: bytearray):
+        self._free.append(buf)
+
+
+class Histogram:
+    """
+    Latency histogram with log-linear buckets
+
+    Each power of two microseconds is split into SUB buckets, a sample is binned in O(1)
+    and quantiles are accurate to within 1 / SUB of the true value.
+    """
+
+    SUB = 4
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """bins a sample (seconds)"""
+        m, e = math.frexp(seconds * 1e6)
+        i = e * self.SUB + int((m - 0.5) * 2 * self.SUB) if e > 0 else 0
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def _upper(self, i: int) -> float:
+        """returns the upper bound (seconds) of bucket i"""
+        if i == 0:
+            return 1e-6
+        e, sub = divmod(i, self.SUB)
+        return 2 ** (e - 1) * (1 + (sub + 1) / self.SUB) * 1e-6
+
+    def snapshot(self) -> dict:
+        """returns count, mean, max and the p50, p90, p99 quantiles (seconds)"""
+        counts = sorted(dict(self.counts).items())
+        snapshot = {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+        for q in (50, 90, 99):
+            rank, seen, val = self.count * q / 100, 0, 0.0
+            for i, n in counts:
+                seen += n
+                if seen >= rank:
+                    val = min(self._upper(i), self.max)
+                    break
+            snapshot[f"p{q}"] = val
+        return snapshot
+
+
+if hasattr(socket.socket, "sendmsg"):
+
+    def sendmsg(sock, buffers, address=None):
+        """Sends buffers as a single datagram, scattered with sendmsg"""
+        if address is None:
+            return sock.sendmsg(buffers)
+        return sock.sendmsg(buffers, (), 0, address)
+
+else:
+
+    def sendmsg(sock, buffers, address=None):
+        """Sends buffers as a single datagram, joined for platforms without sendmsg"""
+        if address is None:
+            return sock.send(b"".join(buffers))
+        return sock.sendto(b"".join(buffers), address)
+
+
 Socket = IntEnum("Socket", "register request response", start=0)
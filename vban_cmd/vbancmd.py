@@ -3,16 +3,23 @@ import socket
 import threading
 import time
 from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
 from pathlib import Path
-from queue import Queue
-from typing import Iterable, Union
+from typing import Iterable, Optional, Union
 
+from .buffer import CommandBuffer
+from .capture import replay
+from .channel import EventChannel
 from .error import VBANCMDError
 from .event import Event
-from .packet import RequestHeader
+from .history import LevelHistory
+from .levels import request_level_backend
+from .meter import request_meter
+from .packet import MAX_PACKET_SIZE, RT_FIELDS, ParamDiff, RequestHeader
+from .resolver import Resolver
 from .subject import Subject
-from .util import Socket, deep_merge, script
-from .worker import Producer, Subscriber, Updater
+from .util import Histogram, Socket, deep_merge, script, sendmsg, split_script
+from .worker import Engine, PacketHandler, Producer, Sender, Subscriber, Updater
 
 logger = logging.getLogger(__name__)
 
@@ -45,13 +52,49 @@ class VbanCmd(metaclass=ABCMeta):
         self.socks = tuple(
             socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in Socket
         )
-        self.subject = self.observer = Subject()
+        self._levels = request_level_backend(self.level_backend)
+        self.meter = request_meter(self.kind, self._levels, self.meter)
+        self.history = (
+            LevelHistory(self.kind, self.history, self._levels)
+            if self.history
+            else None
+        )
+        self._fields = frozenset(RT_FIELDS if self.fields is None else self.fields)
+        if unknown := self._fields - RT_FIELDS.keys():
+            raise ValueError(f"Unknown RT packet fields {sorted(unknown)}")
+        self._params = self._fields - {"levels"}
+        if self.engine not in ("threads", "selector"):
+            raise ValueError(f"Unknown engine '{self.engine}'")
+        if self.overflow not in EventChannel.POLICIES:
+            raise ValueError(f"Unknown overflow policy '{self.overflow}'")
+        self.resolver = Resolver(
+            self.ip,
+            self.port,
+            (self.socks[Socket.register], self.socks[Socket.request]),
+            ttl=self.dns_ttl,
+        )
+        self._send_lock = threading.RLock()
+        self._buffer = CommandBuffer(
+            self._send_script,
+            self.flush_interval,
+            deadlines=self.deadlines,
+            on_drop=lambda cmd: self.cache.pop(cmd, None),
+        )
+        self.subject = self.observer = Subject(self.dispatch, self.max_workers)
         self.cache = {}
         self._pdirty = False
+        self._pdiff = ParamDiff()
         self._ldirty = False
-        self._script = str()
         self.stop_event = None
+        self.handler = None
         self.producer = None
+        # the thread that handles RT packets and notifies observers itself, if any
+        self._inline_thread = None
+        self.sender = None
+        self._outgoing = None
+        self.queues = {}
+        self.datagrams_sent = 0
+        self.bytes_sent = 0
 
     @abstractmethod
     def __str__(self):
@@ -89,20 +132,46 @@ class VbanCmd(metaclass=ABCMeta):
         return self
 
     def login(self) -> None:
-        """Starts the subscriber and updater threads (unless in outbound mode)"""
+        """
+        Starts the subscriber and updater threads, or the selector engine thread (unless in outbound mode)
+
+        Starts the sender thread if outgoing packets are paced.
+        """
+        if self.pace or self.pps:
+            self.sender = Sender(self)
+            self._outgoing = self.sender.queue
+            self.sender.start()
+
         if not self.outbound:
             self.event.info()
 
             self.stop_event = threading.Event()
             self.stop_event.clear()
-            self.subscriber = Subscriber(self, self.stop_event)
-            self.subscriber.start()
-
-            queue = Queue()
-            self.updater = Updater(self, queue)
-            self.updater.start()
-            self.producer = Producer(self, queue, self.stop_event)
-            self.producer.start()
+            self.handler = PacketHandler(self, self.capture)
+            if self.engine == "selector":
+                self.producer = self._inline_thread = Engine(self, self.stop_event)
+                self.producer.start()
+            else:
+                self.subscriber = Subscriber(self, self.stop_event)
+                self.subscriber.start()
+
+                # parameter and level events are dispatched by separate threads,
+                # level dispatch yields to pending parameter events
+                self.queues = {
+                    "pdirty": EventChannel(self.overflow),
+                    "ldirty": EventChannel(self.overflow),
+                }
+                self.updater = Updater(self, self.queues["pdirty"])
+                self.updater.start()
+                self.level_updater = Updater(
+                    self,
+                    self.queues["ldirty"],
+                    name="level updater",
+                    yield_to=self.queues["pdirty"],
+                )
+                self.level_updater.start()
+                self.producer = Producer(self, self.queues, self.stop_event)
+                self.producer.start()
 
         self.logger.info(
             "Successfully logged into VBANCMD {kind} with ip='{ip}', port={port}, streamname='{streamname}'".format(
@@ -113,29 +182,97 @@ class VbanCmd(metaclass=ABCMeta):
     def stopped(self):
         return self.stop_event is None or self.stop_event.is_set()
 
+    def _send(self, payload: bytes, key: str = None):
+        """
+        Sends a request packet, through the send scheduler if outgoing packets are paced.
+
+        A packet queued for the scheduler replaces an unsent packet with the same key.
+        """
+        if self.sender is not None:
+            self.sender.put(payload, key)
+        else:
+            self._transmit(payload)
+
+    def _transmit(self, payload: bytes):
+        """Sends a request packet, header and payload scattered into one datagram."""
+        self.resolver.get()
+        buffers = (self.packet_request.header, payload)
+        with self._send_lock:
+            try:
+                sendmsg(self.socks[Socket.request], buffers)
+            except ConnectionRefusedError:
+                # port unreachable reported for an earlier datagram, the address is fine
+                sendmsg(self.socks[Socket.request], buffers)
+            except OSError:
+                # the cached address may have gone stale, resolve it again and retry once
+                self.resolver.resolve()
+                sendmsg(self.socks[Socket.request], buffers)
+            self.packet_request.framecounter += 1
+            self.datagrams_sent += 1
+            self.bytes_sent += len(buffers[0]) + len(buffers[1])
+
+    def _send_script(self, script: bytes) -> int:
+        """
+        Sends a script split at ; boundaries into the fewest datagrams that fit.
+
+        Returns the number of datagrams sent.
+        """
+        chunks = split_script(script, MAX_PACKET_SIZE)
+        # keep the framecounters of a script in sequence
+        with self._send_lock:
+            for chunk in chunks:
+                self._send(chunk)
+        return len(chunks)
+
     def _set_rt(self, cmd: str, val: Union[str, float]):
         """Sends a string request command over a network."""
-        self.socks[Socket.request].sendto(
-            self.packet_request.header + f"{cmd}={val};".encode(),
-            (socket.gethostbyname(self.ip), self.port),
-        )
-        self.packet_request.framecounter = (
-            int.from_bytes(self.packet_request.framecounter, "little") + 1
-        ).to_bytes(4, "little")
         self.cache[cmd] = val
+        # parenthesised args (FadeBy, AppGain...) are not idempotent, never coalesce them
+        key = None if str(val).startswith("(") else cmd
+        if self.combine:
+            self._buffer.add(f"{cmd}={val};".encode(), key=key)
+        else:
+            return self._send(f"{cmd}={val};".encode(), key)
 
     @script
-    def sendtext(self, script):
-        """Sends a multiple parameter string over a network."""
-        self.socks[Socket.request].sendto(
-            self.packet_request.header + script.encode(),
-            (socket.gethostbyname(self.ip), self.port),
-        )
-        self.packet_request.framecounter = (
-            int.from_bytes(self.packet_request.framecounter, "little") + 1
-        ).to_bytes(4, "little")
+    def sendtext(self, script) -> Optional[int]:
+        """
+        Sends a multiple parameter string over a network.
+
+        Returns the number of datagrams the script was split into.
+        In combine mode the script is buffered rather than sent, returns None.
+        """
         self.logger.debug(f"sendtext: {script}")
-        time.sleep(self.DELAY)
+        if self.combine:
+            # terminated, so the next buffered command does not run into it
+            self._buffer.add(script.rstrip(";").encode() + b";")
+            return
+        num = self._send_script(script.encode())
+        self._delay()
+        return num
+
+    def _delay(self):
+        """Sleeps DELAY, unless outgoing packets are paced by the send scheduler."""
+        if self.sender is None:
+            time.sleep(self.DELAY)
+
+    def flush(self) -> None:
+        """Sends any commands held in the write-combining buffer."""
+        self._buffer.flush()
+
+    @contextmanager
+    def combined(self):
+        """
+        Write-combines all commands sent within the block
+
+        The buffer is flushed on exit.
+        """
+        combine, self.combine = self.combine, True
+        try:
+            yield self
+        finally:
+            self.combine = combine
+            self.flush()
 
     @property
     def type(self) -> str:
@@ -152,6 +289,11 @@ class VbanCmd(metaclass=ABCMeta):
         """True iff a parameter has changed"""
         return self._pdirty
 
+    @property
+    def pdiff(self) -> ParamDiff:
+        """Bitmaps of the parameters that changed with the latest pdirty update"""
+        return self._pdiff
+
     @property
     def ldirty(self):
         """True iff a level value has changed."""
@@ -161,7 +303,74 @@ class VbanCmd(metaclass=ABCMeta):
     def public_packet(self):
         return self._public_packet
 
+    @property
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the pipeline counters, queue depths and latencies (seconds)
+
+        Latencies are histogram snapshots: count, mean, max, p50, p90 and p99.
+        """
+        handler = self.handler
+        pool = getattr(handler, "pool", None)
+        outgoing = self._outgoing
+        observers = {
+            str(observer): stats for observer, stats in self.subject.stats.items()
+        }
+        callbacks = {name: stats.pop("latency") for name, stats in observers.items()}
+        return {
+            "packets": {
+                name: getattr(handler, name, 0)
+                for name in (
+                    "received",
+                    "accepted",
+                    "skipped",
+                    "malformed",
+                    "superseded",
+                )
+            },
+            "sent": {"datagrams": self.datagrams_sent, "bytes": self.bytes_sent},
+            "latency": {
+                "decode": (handler.decode_time if handler else Histogram()).snapshot(),
+                "diff": (handler.diff_time if handler else Histogram()).snapshot(),
+                "queue_wait": {
+                    event: queue.wait.snapshot() for event, queue in self.queues.items()
+                },
+                "observers": callbacks,
+            },
+            "queues": {
+                event: {
+                    "depth": len(queue),
+                    "coalesced": queue.coalesced,
+                    "dropped": queue.dropped,
+                }
+                for event, queue in self.queues.items()
+            },
+            "observers": observers,
+            "buffers": {
+                "allocated": pool.allocated if pool else 0,
+                "free": len(pool) if pool else 0,
+            },
+            "combine": {
+                "pending": len(self._buffer),
+                "coalesced": self._buffer.coalesced,
+                "dropped": self._buffer.dropped,
+            },
+            "pace": {
+                "pending": len(outgoing) if outgoing is not None else 0,
+                "coalesced": outgoing.coalesced if outgoing is not None else 0,
+                "dropped": outgoing.dropped if outgoing is not None else 0,
+            },
+            "resolver": self.resolver.stats,
+        }
+
     def clear_dirty(self) -> None:
+        """
+        Waits for pdirty to clear, so a sync getter reads the state after pending updates
+
+        Doesn't wait on the thread that handles RT packets, an observer there would wait for itself.
+        """
+        if threading.current_thread() is self._inline_thread:
+            return
         while self.pdirty:
             time.sleep(self.DELAY)
 
@@ -176,11 +385,20 @@ class VbanCmd(metaclass=ABCMeta):
             packet.outputlevels,
         )
 
-    def apply(self, data: dict):
+    def _cache_levels(self, packet) -> None:
+        """caches both level arrays of a packet, before and after dB conversion"""
+        self.cache["strip_level"], self.cache["bus_level"] = self._get_levels(packet)
+        self.cache["strip_level_db"], self.cache["bus_level_db"] = (
+            packet.inputlevels_db,
+            packet.outputlevels_db,
+        )
+
+    def apply(self, data: dict) -> Optional[int]:
         """
         Sets all parameters of a dict
 
-        minor delay between each recursion
+        The script for all targets is split into the fewest datagrams that fit.
+        Returns the number of datagrams sent, None if buffered in combine mode.
         """
 
         def target(key):
@@ -201,10 +419,16 @@ class VbanCmd(metaclass=ABCMeta):
                     raise ValueError(ERR_MSG)
             return target[int(index)]
 
-        [target(key).apply(di).then_wait() for key, di in data.items()]
+        return self.sendtext(
+            "".join(target(key)._script(di) for key, di in data.items())
+        )
+
+    def apply_config(self, name) -> Optional[int]:
+        """
+        applies a config from memory
 
-    def apply_config(self, name):
-        """applies a config from memory"""
+        Returns the number of datagrams sent, None if buffered in combine mode.
+        """
         ERR_MSG = (
             f"No config with name '{name}' is loaded into memory",
             f"Known configs: {list(self.configs.keys())}",
@@ -225,16 +449,45 @@ class VbanCmd(metaclass=ABCMeta):
             self.logger.debug(
                 f"profile '{name}' extends '{extended}', profiles merged.."
             )
-        self.apply(config)
+        num = self.apply(config)
         self.logger.info(f"Profile '{name}' applied!")
+        return num
+
+    def replay(self, filepath, speed: float = 1.0) -> int:
+        """
+        Replays an RT packet capture through the decode, diff and dispatch pipeline, observers are notified inline.
+
+        speed: 1.0 for the original timing, N for N times faster, 0 for as fast as possible.
+        Returns the number of packets replayed.
+        """
+        if not self.stopped():
+            raise VBANCMDError("cannot replay while receiving RT packets")
+        self.handler = PacketHandler(self)
+        self._inline_thread = threading.current_thread()
+        try:
+            num = replay(self.handler, filepath, speed)
+        finally:
+            self._inline_thread = None
+        self.logger.info(f"replayed {num} packets from {filepath}")
+        return num
 
     def logout(self) -> None:
+        self._buffer.close()
+        if self.sender is not None:
+            self.sender, sender = None, self.sender
+            sender.stop()
         if not self.stopped():
             self.logger.debug("events thread shutdown started")
             self.stop_event.set()
-            if self.producer is not None:
+            if isinstance(self.producer, Engine):
+                self.producer.wake()
+                self.producer.join()
+            elif self.producer is not None:
                 for t in (self.producer, self.subscriber):
                     t.join()
+        if self.handler is not None:
+            self.handler.close()
+        self.subject.shutdown()
         [sock.close() for sock in self.socks]
         self.logger.info(f"{type(self).__name__}: Successfully logged out of {self}")
 
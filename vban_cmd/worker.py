@@ -1,16 +1,59 @@
+import contextlib
 import logging
+import selectors
 import socket
 import threading
 import time
 from typing import Optional
 
+from .buffer import SendQueue
+from .capture import CaptureWriter
 from .error import VBANCMDConnectionError
-from .packet import HEADER_SIZE, SubscribeHeader, VbanRtPacket, VbanRtPacketHeader
-from .util import Socket
+from .packet import (
+    HEADER_SIZE,
+    MAX_PACKET_SIZE,
+    RT_BODY,
+    RT_PACKET_SIZE,
+    ParamDiff,
+    SubscribeHeader,
+    VbanRtPacket,
+    VbanRtPacketHeader,
+)
+from .util import BufferPool, Histogram, Socket, TokenBucket
 
 logger = logging.getLogger(__name__)
 
 
+def pacing(remote) -> tuple:
+    """
+    Returns the token bucket and packet cost function for the pacing options of a remote
+
+    The bucket is derived from pps (packets per second) or else from bps (bits per second).
+    With neither, it allows a packet every DELAY seconds, the budget of the fixed sleeps that pacing replaces.
+    """
+    if remote.bps and not remote.pps:
+        return (
+            TokenBucket(
+                remote.bps / 8,
+                max(remote.bps / 80, HEADER_SIZE + 4 + MAX_PACKET_SIZE),
+            ),
+            lambda payload: HEADER_SIZE + 4 + len(payload),
+        )
+    pps = remote.pps or 1 / remote.DELAY
+    return TokenBucket(pps, max(pps / 10, 1)), lambda payload: 1
+
+
+def subscribe(remote, packet: SubscribeHeader):
+    """sends a subscription packet, the framecounter is incremented"""
+    remote.resolver.get()
+    try:
+        remote.socks[Socket.register].send(packet.header)
+    except ConnectionRefusedError:
+        # port unreachable reported for an earlier registration
+        logger.debug(f"{remote.ip} refused an RT packet registration")
+    packet.framecounter += 1
+
+
 class Subscriber(threading.Thread):
     """fire a subscription packet every 10 seconds"""
 
@@ -23,20 +66,8 @@ class Subscriber(threading.Thread):
 
     def run(self):
         while not self.stopped():
-            try:
-                self._remote.socks[Socket.register].sendto(
-                    self.packet.header,
-                    (socket.gethostbyname(self._remote.ip), self._remote.port),
-                )
-                self.packet.framecounter = (
-                    int.from_bytes(self.packet.framecounter, "little") + 1
-                ).to_bytes(4, "little")
-                self.wait_until_stopped(10)
-            except socket.gaierror as e:
-                self.logger.exception(f"{type(e).__name__}: {e}")
-                raise VBANCMDConnectionError(
-                    f"unable to resolve hostname {self._remote.ip}"
-                ) from e
+            subscribe(self._remote, self.packet)
+            self.wait_until_stopped(10)
         self.logger.debug(f"terminating {self.name} thread")
 
     def stopped(self):
@@ -50,27 +81,230 @@ class Subscriber(threading.Thread):
             time.sleep(period)
 
 
+class PacketHandler:
+    """
+    Decodes, diffs and publishes RT packets for a remote
+
+    Independent of how packets are received, shared by the threaded and asyncio clients.
+    Every datagram passes through intake(), RT packets are counted as received and appended to capture (a file path), if given.
+    decode_time times building a packet and its level arrays, diff_time the parameter diff and level comparison.
+    pdiff holds the ParamDiff of the latest packet handled, it travels with its event to dispatch().
+    packet is the latest packet decoded, None if it was skipped. meter() feeds it to the meter.
+    """
+
+    def __init__(self, remote, capture=None):
+        self._remote = remote
+        self.logger = logger.getChild(self.__class__.__name__)
+        self.packet_expected = VbanRtPacketHeader()
+        self.received = 0
+        self.accepted = 0
+        self.skipped = 0
+        self.malformed = 0
+        self.superseded = 0
+        self.pdiff = ParamDiff()
+        self.packet = None
+        self.decode_time = Histogram()
+        self.diff_time = Histogram()
+        self.pool = (
+            BufferPool(self._remote.recv_buffers, RT_PACKET_SIZE)
+            if self._remote.recv_buffers
+            else None
+        )
+        self.capture = CaptureWriter(capture) if capture else None
+        self._data = None
+        self._body = None
+        self._remote._strip_comp = [False] * (self._remote.kind.num_strip_levels)
+        self._remote._bus_comp = [False] * (self._remote.kind.num_bus_levels)
+
+    def validate(self, data: bytes) -> bool:
+        """True iff data is a VBAN RT response packet"""
+        # do we have packet data? is the packet of type VBAN RT response?
+        return len(data) >= RT_PACKET_SIZE and data.startswith(
+            self.packet_expected.header
+        )
+
+    def intake(self, data, nbytes: int = None) -> Optional[bytes]:
+        """
+        Validates, counts and captures a datagram, however it was received.
+
+        nbytes is the length of a datagram received into a buffer.
+        Returns the datagram if it is an RT packet, counted as received whether it is handled or superseded.
+        """
+        if nbytes not in (None, RT_PACKET_SIZE) or not self.validate(data):
+            self.malformed += 1
+            return
+        self.received += 1
+        if self.capture is not None:
+            self.capture.write(data)
+        return data
+
+    def recv(self, sock) -> Optional[bytes]:
+        """
+        Receives a datagram, into a pooled buffer if recv_buffers is set.
+
+        Returns the datagram if it is an RT packet, socket errors propagate.
+        """
+        if self.pool is None:
+            data, _ = sock.recvfrom(2048)
+            return self.intake(data)
+        data = self.pool.acquire()
+        try:
+            nbytes, _ = sock.recvfrom_into(data)
+        except OSError:
+            self.pool.release(data)
+            raise
+        if self.intake(data, nbytes) is None:
+            self.pool.release(data)
+            return
+        return data
+
+    def close(self):
+        """closes the capture file, if any"""
+        if self.capture is not None:
+            self.capture, capture = None, self.capture
+            capture.close()
+
+    def release(self, data):
+        """returns a superseded buffer to the pool"""
+        if self.pool is not None and data is not self._data:
+            self.pool.release(data)
+
+    def _accept(self, data, packet: VbanRtPacket):
+        """promotes a packet to public packet, the buffer it supersedes is released"""
+        self.accepted += 1
+        data, self._data = self._data, data
+        self._body = memoryview(self._data)[RT_BODY]
+        self._remote._public_packet = packet
+        if data is not None:
+            self.release(data)
+
+    def _make_packet(self, data: bytes) -> VbanRtPacket:
+        return VbanRtPacket(
+            _kind=self._remote.kind,
+            _data=memoryview(data),
+            _levels=self._remote._levels,
+        )
+
+    def _record(self, packet: VbanRtPacket):
+        """feeds the levels of every packet that isn't skipped to the level history"""
+        if self._remote.history is not None:
+            self._remote.history.append(packet.inputlevels, packet.outputlevels)
+
+    def meter(self, packet: VbanRtPacket = None):
+        """advances the meter on the dB levels of packet (by default the latest packet decoded), if metering"""
+        if packet is None:
+            packet = self.packet
+        if packet is not None and self._remote.meter is not None:
+            self._remote.meter.update(packet.inputlevels_db, packet.outputlevels_db)
+
+    def prime(self, data: bytes):
+        """accepts the first packet as the public packet"""
+        self._accept(data, self._make_packet(data))
+        self.packet = self._remote.public_packet
+        self._remote._cache_levels(self.packet)
+        self._record(self.packet)
+        self.meter()
+
+    def handle(self, data: bytes) -> tuple:
+        """
+        Updates the dirty states of the remote from a packet
+
+        Returns the subscribed events that are dirty.
+        """
+        # fast path, nothing has changed since the last accepted packet
+        if data.startswith(self._body, RT_BODY.start):
+            self.skipped += 1
+            self.packet = None
+            self.release(data)
+            self._remote._pdirty = self._remote._ldirty = False
+            return ()
+
+        start = time.perf_counter()
+        self.packet = _pp = self._make_packet(data)
+        if (
+            "levels" in self._remote._fields
+            or self._remote.meter is not None
+            or self._remote.history is not None
+        ):
+            # decoded up front, so decode_time covers the level arrays
+            # and the packet can be metered after its buffer is released
+            _pp.inputlevels, _pp.outputlevels
+        decoded = time.perf_counter()
+        pdiff = _pp.pdiff(self._remote.public_packet, self._remote._params)
+        pdirty = bool(pdiff)
+        ldirty = "levels" in self._remote._fields and _pp.ldirty(
+            self._remote.cache["strip_level"], self._remote.cache["bus_level"]
+        )
+        self.diff_time.record(time.perf_counter() - decoded)
+        self.decode_time.record(decoded - start)
+        self._record(_pp)
+
+        if pdirty or ldirty:
+            self._accept(data, _pp)
+        else:
+            self.release(data)
+        self._remote._pdirty = pdirty
+        self._remote._ldirty = ldirty
+        # vban.pdiff is only updated on dispatch, an updater may still be notifying the previous diff
+        self.pdiff = pdiff
+
+        return tuple(
+            event
+            for event, dirty in (("pdirty", pdirty), ("ldirty", ldirty))
+            if dirty and getattr(self._remote.event, event)
+        )
+
+    def dispatch(self, event: str, packet: VbanRtPacket = None, pdiff=None):
+        """
+        Notifies observers of an event raised by packet (by default the public packet).
+
+        For pdirty, pdiff (by default that of the latest packet handled) is passed to the observers.
+        Generates _strip_comp, _bus_comp and updates the level cache if ldirty.
+        A meter event advances the meter on packet (by default the latest packet decoded).
+        """
+        if event == "meter":
+            return self.meter(packet)
+        if packet is None:
+            packet = self._remote._public_packet
+        if event == "pdirty":
+            if pdiff is None:
+                pdiff = self.pdiff
+            self._remote._pdiff = pdiff
+            self._remote.subject.notify(event, pdiff)
+        elif event == "ldirty":
+            self._remote._strip_comp, self._remote._bus_comp = (
+                packet._strip_comp,
+                packet._bus_comp,
+            )
+            self._remote._cache_levels(packet)
+            self._remote.subject.notify(event)
+
+
 class Producer(threading.Thread):
-    """Continously send job queue to the Updater thread at a rate of self._remote.ratelimit."""
+    """
+    Continously send jobs to the Updater threads at a rate of self._remote.ratelimit.
+
+    queues maps each event to the channel of the Updater that dispatches it.
+    """
 
-    def __init__(self, remote, queue, stop_event):
+    def __init__(self, remote, queues, stop_event):
         super().__init__(name="producer", daemon=False)
         self._remote = remote
-        self.queue = queue
+        self.handler = remote.handler
+        self.queues = queues
         self.stop_event = stop_event
         self.logger = logger.getChild(self.__class__.__name__)
-        self.packet_expected = VbanRtPacketHeader()
         self._remote.socks[Socket.response].settimeout(self._remote.timeout)
+        if self._remote.rcvbuf:
+            self._remote.socks[Socket.response].setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, self._remote.rcvbuf
+            )
         self._remote.socks[Socket.response].bind(
             (socket.gethostbyname(socket.gethostname()), self._remote.port)
         )
-        self._remote._public_packet = self._get_rt()
-        (
-            self._remote.cache["strip_level"],
-            self._remote.cache["bus_level"],
-        ) = self._remote._get_levels(self._remote.public_packet)
+        self.handler.prime(self._get_rt())
 
-    def _get_rt(self) -> VbanRtPacket:
+    def _get_rt(self) -> bytes:
         """Attempt to fetch data packet until a valid one found"""
 
         def fget():
@@ -81,67 +315,51 @@ class Producer(threading.Thread):
 
         return fget()
 
-    def _fetch_rt_packet(self) -> Optional[VbanRtPacket]:
+    def _fetch_rt_packet(self) -> Optional[bytes]:
         try:
-            data, _ = self._remote.socks[Socket.response].recvfrom(2048)
-            # do we have packet data?
-            if len(data) > HEADER_SIZE:
-                # is the packet of type VBAN RT response?
-                if self.packet_expected.header == data[:HEADER_SIZE]:
-                    return VbanRtPacket(
-                        _kind=self._remote.kind,
-                        _voicemeeterType=data[28:29],
-                        _reserved=data[29:30],
-                        _buffersize=data[30:32],
-                        _voicemeeterVersion=data[32:36],
-                        _optionBits=data[36:40],
-                        _samplerate=data[40:44],
-                        _inputLeveldB100=data[44:112],
-                        _outputLeveldB100=data[112:240],
-                        _TransportBit=data[240:244],
-                        _stripState=data[244:276],
-                        _busState=data[276:308],
-                        _stripGaindB100Layer1=data[308:324],
-                        _stripGaindB100Layer2=data[324:340],
-                        _stripGaindB100Layer3=data[340:356],
-                        _stripGaindB100Layer4=data[356:372],
-                        _stripGaindB100Layer5=data[372:388],
-                        _stripGaindB100Layer6=data[388:404],
-                        _stripGaindB100Layer7=data[404:420],
-                        _stripGaindB100Layer8=data[420:436],
-                        _busGaindB100=data[436:452],
-                        _stripLabelUTF8c60=data[452:932],
-                        _busLabelUTF8c60=data[932:1412],
-                    )
+            return self.handler.recv(self._remote.socks[Socket.response])
         except TimeoutError as e:
             self.logger.exception(f"{type(e).__name__}: {e}")
             raise VBANCMDConnectionError(
                 f"timeout waiting for RtPacket from {self._remote.ip}"
             ) from e
 
+    def _get_latest(self) -> bytes:
+        """Waits for a packet then drains the socket buffer, returns the newest packet"""
+        data = self._get_rt()
+        sock = self._remote.socks[Socket.response]
+        sock.settimeout(0)
+        try:
+            while True:
+                try:
+                    newer = self.handler.recv(sock)
+                except BlockingIOError:
+                    break
+                if newer is not None:
+                    self.handler.superseded += 1
+                    self.handler.release(data)
+                    data = newer
+        finally:
+            sock.settimeout(self._remote.timeout)
+        return data
+
     def stopped(self):
         return self.stop_event.is_set()
 
     def run(self):
+        fget = self._get_latest if self._remote.latest else self._get_rt
         while not self.stopped():
-            _pp = self._get_rt()
-            pdirty = _pp.pdirty(self._remote.public_packet)
-            ldirty = _pp.ldirty(
-                self._remote.cache["strip_level"], self._remote.cache["bus_level"]
-            )
-
-            if pdirty or ldirty:
-                self._remote._public_packet = _pp
-            self._remote._pdirty = pdirty
-            self._remote._ldirty = ldirty
-
-            if self._remote.event.pdirty:
-                self.queue.put("pdirty")
-            if self._remote.event.ldirty:
-                self.queue.put("ldirty")
+            for event in self.handler.handle(fget()):
+                self.queues[event].put(
+                    event, self._remote._public_packet, self.handler.pdiff
+                )
+            if self._remote.meter is not None and self.handler.packet is not None:
+                # metered by the level updater, off the receive path
+                self.queues["ldirty"].put("meter", self.handler.packet)
             time.sleep(self._remote.ratelimit)
         self.logger.debug(f"terminating {self.name} thread")
-        self.queue.put(None)
+        for queue in set(self.queues.values()):
+            queue.close()
 
 
 class Updater(threading.Thread):
@@ -149,36 +367,172 @@ class Updater(threading.Thread):
     continously updates the public packet
 
     notifies observers of event updates
+
+    If yield_to is given, each dispatch first waits (up to ratelimit) for that channel to go idle.
     """
 
-    def __init__(self, remote, queue):
-        super().__init__(name="updater", daemon=True)
+    def __init__(self, remote, queue, name="updater", yield_to=None):
+        super().__init__(name=name, daemon=True)
         self._remote = remote
+        self.handler = remote.handler
         self.queue = queue
+        self.yield_to = yield_to
         self.logger = logger.getChild(self.__class__.__name__)
-        self._remote._strip_comp = [False] * (self._remote.kind.num_strip_levels)
-        self._remote._bus_comp = [False] * (self._remote.kind.num_bus_levels)
 
     def run(self):
-        """
-        Continously update observers of dirty states.
+        """Continously update observers of dirty states."""
+        while item := self.queue.get():
+            if self.yield_to is not None:
+                self.yield_to.wait_idle(self._remote.ratelimit)
+            self.handler.dispatch(*item)
+            self.queue.done()
+        self.logger.debug(f"terminating {self.name} thread")
 
-        Generate _strip_comp, _bus_comp and update level cache if ldirty.
-        """
-        while event := self.queue.get():
-            if event == "pdirty" and self._remote.pdirty:
-                self._remote.subject.notify(event)
-            elif event == "ldirty" and self._remote.ldirty:
-                self._remote._strip_comp, self._remote._bus_comp = (
-                    self._remote._public_packet._strip_comp,
-                    self._remote._public_packet._bus_comp,
-                )
-                (
-                    self._remote.cache["strip_level"],
-                    self._remote.cache["bus_level"],
-                ) = (
-                    self._remote._public_packet.inputlevels,
-                    self._remote._public_packet.outputlevels,
-                )
-                self._remote.subject.notify(event)
+
+class Engine(Producer):
+    """
+    Single threaded engine, one selectors loop in place of the Subscriber, Producer and Updater threads.
+
+    Renews the RT subscription, receives packets non-blocking and notifies observers.
+    At most BATCH packets are read per wake-up, so slow observers can't starve renewal or stop.
+    """
+
+    RENEW = 10
+    BATCH = 16
+
+    def __init__(self, remote, stop_event):
+        self.packet = SubscribeHeader()
+        subscribe(remote, self.packet)
+        self._renew = time.monotonic() + self.RENEW
+        super().__init__(remote, None, stop_event)
+        self.name = "engine"
+        self._sock = self._remote.socks[Socket.response]
+        self._sock.setblocking(False)
+        self._waker, self._wakeup = socket.socketpair()
+        self._waker.setblocking(False)
+        self._last = time.monotonic()
+
+    def wake(self):
+        """interrupts the select call, for example to stop the engine"""
+        self._wakeup.send(b"\0")
+
+    def _receive(self):
+        """handles up to BATCH packets waiting in the socket buffer, or only the newest of them if latest"""
+        latest = None
+        for _ in range(self.BATCH):
+            try:
+                data = self.handler.recv(self._sock)
+            except BlockingIOError:
+                break
+            if data is not None:
+                self._last = time.monotonic()
+                if not self._remote.latest:
+                    self._handle(data)
+                    continue
+                if latest is not None:
+                    self.handler.superseded += 1
+                    self.handler.release(latest)
+                latest = data
+        if latest is not None:
+            self._handle(latest)
+
+    def _handle(self, data: bytes):
+        for event in self.handler.handle(data):
+            self.handler.dispatch(event)
+        self.handler.meter()
+
+    def run(self):
+        with selectors.DefaultSelector() as sel:
+            sel.register(self._sock, selectors.EVENT_READ)
+            sel.register(self._waker, selectors.EVENT_READ)
+            while not self.stopped():
+                if (now := time.monotonic()) >= self._renew:
+                    subscribe(self._remote, self.packet)
+                    self._renew = now + self.RENEW
+                for key, _ in sel.select(min(self._renew - now, self._remote.timeout)):
+                    if key.fileobj is self._sock:
+                        self._receive()
+                    else:
+                        self._waker.recv(64)
+                if time.monotonic() - self._last > self._remote.timeout:
+                    self.logger.error(
+                        f"timeout waiting for RtPacket from {self._remote.ip}"
+                    )
+                    self._last = time.monotonic()
+        for sock in (self._waker, self._wakeup):
+            sock.close()
+        self.logger.debug(f"terminating {self.name} thread")
+
+
+class Pacer:
+    """
+    Paces the request packets of a SendQueue, shared by the Sender thread and the asyncio sender task
+
+    Tokens are taken for the next packet before it is popped, so a newer value or its deadline applies at send time.
+    lock, if given, guards the queue.
+    """
+
+    def __init__(self, remote, on_drop=None, lock=None):
+        self._remote = remote
+        self.queue = SendQueue(remote.deadlines, on_drop=on_drop)
+        self.bucket, self._cost = pacing(remote)
+        self._lock = lock or contextlib.nullcontext()
+
+    def due(self) -> Optional[float]:
+        """takes the tokens for the next packet, returns the time (seconds) until it is due or None if none is queued"""
+        with self._lock:
+            payload = self.queue.peek()
+        if payload is not None:
+            return self.bucket.take(self._cost(payload))
+
+    def send(self):
+        """sends the next packet, returns its waiter (None if the queue was emptied meanwhile)"""
+        with self._lock:
+            item = self.queue.pop()
+        if item is not None:
+            self._remote._transmit(item[0])
+            return item[1]
+
+
+class Sender(threading.Thread):
+    """
+    Sends queued request packets, paced by a token bucket.
+
+    Queued commands are coalesced per command path and the deadlines of the remote apply, see SendQueue.
+    """
+
+    def __init__(self, remote):
+        super().__init__(name="sender", daemon=True)
+        self._cond = threading.Condition()
+        self.pacer = Pacer(
+            remote, on_drop=lambda cmd, _: remote.cache.pop(cmd, None), lock=self._cond
+        )
+        self.queue = self.pacer.queue
+        self.logger = logger.getChild(self.__class__.__name__)
+        self._closed = False
+
+    def put(self, payload: bytes, key: str = None):
+        with self._cond:
+            self.queue.put(payload, key)
+            self._cond.notify()
+
+    def _wait(self) -> bool:
+        """blocks until a packet is queued, returns False once stopped and empty"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.queue or self._closed)
+            return bool(self.queue)
+
+    def run(self):
+        while self._wait():
+            if (wait := self.pacer.due()) is not None:
+                if wait > 0:
+                    time.sleep(wait)
+                self.pacer.send()
         self.logger.debug(f"terminating {self.name} thread")
+
+    def stop(self):
+        """sends any queued packets then terminates the thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.join()